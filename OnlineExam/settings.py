@@ -12,12 +12,19 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+import tempfile
 
 
 BASE_DIR = Path(__file__).resolve().parent.parent
-LOG_DIR = BASE_DIR / 'logs'
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+# اجرای تست‌ها در پوشه‌ی logs مخزن نمی‌نویسد
+LOG_DIR = Path(os.environ.get('LOG_DIR') or (tempfile.mkdtemp(prefix='onlineexam-logs-') if TESTING else BASE_DIR / 'logs'))
 LOG_DIR.mkdir(exist_ok=True)  
 
+# رکوردها در thread درخواست فقط در صف قرار می‌گیرند؛ هندلرهای فایل و کنسول
+# به لاگر quiz.log.sink وصل‌اند و در thread جداگانه‌ی Quiz.log.QueueListenerHandler
+# اجرا می‌شوند (QuizConfig.ready آن را راه می‌اندازد).
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -34,15 +41,34 @@ LOGGING = {
             'format': '[%(asctime)s] %(levelname)s [%(name)s:%(lineno)s] %(funcName)s - %(message)s',
             'datefmt': '%Y-%m-%d %H:%M:%S',
         },
+        'json': {
+            '()': 'Quiz.log.JsonFormatter',
+        },
+    },
+    'filters': {
+        'request_context': {
+            '()': 'Quiz.log.RequestContextFilter',
+        },
+        'sampling': {
+            '()': 'Quiz.log.SamplingFilter',
+            'rates': {
+                'django.server': 0.1,
+            },
+        },
     },
     'handlers': {
+        'queue': {
+            '()': 'Quiz.log.QueueListenerHandler',
+            'sink': 'quiz.log.sink',
+            'filters': ['request_context', 'sampling'],
+        },
         'file': {
             'level': 'INFO',  
             'class': 'logging.handlers.RotatingFileHandler',
             'filename': LOG_DIR / 'quiz_app.log',
             'maxBytes': 1024*1024*10,  
             'backupCount': 5,
-            'formatter': 'detailed',
+            'formatter': 'json',
         },
         'error_file': {
             'level': 'ERROR',
@@ -50,7 +76,7 @@ LOGGING = {
             'filename': LOG_DIR / 'quiz_errors.log',
             'maxBytes': 1024*1024*5,
             'backupCount': 10,
-            'formatter': 'detailed',
+            'formatter': 'json',
         },
         'console': {
             'level': 'DEBUG',
@@ -60,22 +86,27 @@ LOGGING = {
     },
     'loggers': {
         '': {  
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': False,
         },
         'django.request': {
-            'handlers': ['error_file'],
+            'handlers': ['queue'],
             'level': 'ERROR',
             'propagate': False,
         },
         'quiz': {  
-            'handlers': ['file', 'error_file', 'console'],
+            'handlers': ['queue'],
+            'level': 'DEBUG',
+            'propagate': False,
+        },
+        'quiz.log.sink': {
+            'handlers': ['console', 'file', 'error_file'],
             'level': 'DEBUG',
             'propagate': False,
         },
@@ -109,11 +140,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'Quiz.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'Quiz.middleware.ReplicaStickinessMiddleware',
+    'Quiz.middleware.RequestLogContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -150,9 +184,35 @@ DATABASES = {
         'PASSWORD': '123456789',
         'HOST': '127.0.0.1',
         'PORT': '5432',
+        # اتصال‌ها بین درخواست‌ها نگه داشته می‌شوند و قبل از استفاده بررسی می‌شوند
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# استخر اتصال psycopg (نیازمند psycopg[pool])؛ با استخر، CONN_MAX_AGE باید صفر باشد
+if os.environ.get('DB_POOL_MAX_SIZE'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ['DB_POOL_MAX_SIZE']),
+            'timeout': 10,
+        },
+    }
+
+# رپلیکای فقط‌خواندنی برای صفحات گزارش (Quiz.db_routers)
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['Quiz.db_routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+
 
 
 
@@ -187,12 +247,36 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded answers; never exposed directly, see Quiz.downloads
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+# '' (Django streams), 'x-accel-redirect' (nginx) or 'x-sendfile' (Apache/lighttpd)
+FILE_DOWNLOAD_ACCEL = os.environ.get('FILE_DOWNLOAD_ACCEL', '')
+# nginx: location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+FILE_DOWNLOAD_ACCEL_PREFIX = '/protected-media/'
+FILE_DOWNLOAD_MAX_AGE = 3600
+
+
+# در استقرار چندپردازه‌ای باید یک کش مشترک (Redis/Memcached) تنظیم شود؛
+# نشست‌ها و سایر داده‌های کش‌شده بین پردازه‌ها به اشتراک گذاشته می‌شوند.
+# `manage.py check --deploy` کش محلی (Quiz.W001) را گزارش می‌کند.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'onlineexam'),
+    }
+}
+# with a per-process cache, cached sessions and shared rate-limit counts would diverge between workers
+CACHE_IS_SHARED = CACHES['default']['BACKEND'].rsplit('.', 1)[-1] not in ('LocMemCache', 'DummyCache')
+
 
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'Quiz.User'
+AUTHENTICATION_BACKENDS = ['Quiz.backends.CachedModelBackend']
+USER_CACHE_TIMEOUT = 3600
 
 LOGIN_URL = 'Quiz:login'
 LOGIN_REDIRECT_URL = '/'
@@ -201,4 +285,74 @@ LOGOUT_REDIRECT_URL = 'Quiz:login'
 
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False  
 SESSION_COOKIE_AGE = 3600 * 24 * 7  
-SESSION_SAVE_EVERY_REQUEST = True   
+# Quiz.sessions فقط در صورت تغییر داده یا نزدیک شدن انقضا در دیتابیس می‌نویسد؛
+# چون نشست‌ها را کش می‌کند، فقط با کش مشترک فعال می‌شود
+SESSION_ENGINE = 'Quiz.sessions' if CACHE_IS_SHARED else 'django.contrib.sessions.backends.db'
+# با موتور db هر ذخیره یک UPDATE است؛ آنجا انقضا فقط هنگام تغییر نشست (مثلاً ورود) تمدید می‌شود
+SESSION_SAVE_EVERY_REQUEST = CACHE_IS_SHARED
+SESSION_WRITE_REFRESH = 3600 * 12
+SESSION_TOUCH_BATCH_SIZE = 200
+SESSION_TOUCH_FLUSH_INTERVAL = 30
+
+
+# SMS
+# بک‌اندهای موجود: Quiz.sms.ConsoleBackend, Quiz.sms.FileBackend,
+# Quiz.sms.LocMemBackend (برای تست) و Quiz.sms.HttpBackend
+SMS_BACKEND = 'Quiz.sms.ConsoleBackend'
+SMS_FILE_PATH = LOG_DIR / 'sms.log'
+SMS_GATEWAY_URL = os.environ.get('SMS_GATEWAY_URL', 'http://127.0.0.1:8025/send')
+SMS_GATEWAY_API_KEY = os.environ.get('SMS_GATEWAY_API_KEY', '')
+SMS_SENDER = os.environ.get('SMS_SENDER', '')
+SMS_GATEWAY_TIMEOUT = 10
+SMS_MAX_WORKERS = 16
+# messages per second, keyed by backend path
+SMS_RATE_LIMITS = {
+    'Quiz.sms.HttpBackend': 20,
+}
+
+# Rate limiting (Quiz.ratelimit): POSTs per client IP or posted field, '<count>/<period>'
+# LocMemBackend counts per process; CacheBackend shares the counts through CACHES['default']
+RATELIMIT_ENABLED = True
+RATELIMIT_BACKEND = 'Quiz.ratelimit.CacheBackend' if CACHE_IS_SHARED else 'Quiz.ratelimit.LocMemBackend'
+# A school behind one NAT shows up as a single IP at exam start, so the IP rules only
+# stop floods; the tight limits are on the username and phone keys.
+RATELIMITS = {
+    'login': {'ip': '600/m', 'post:username': '10/5m'},
+    'register': {'ip': '300/h'},
+    'verify_sms': {'ip': '300/h', 'post:phone': '5/15m'},
+}
+# Behind nginx every request comes from the proxy; take the client address from the
+# header it sets (proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for), but only
+# for requests that really came from these addresses.
+RATELIMIT_CLIENT_IP_HEADER = os.environ.get('RATELIMIT_CLIENT_IP_HEADER', 'HTTP_X_FORWARDED_FOR')
+RATELIMIT_TRUSTED_PROXIES = os.environ.get('TRUSTED_PROXIES', '127.0.0.1,::1').split(',')
+
+# Exam scheduler (manage.py run_exam_scheduler): minutes before start_date
+EXAM_REMINDER_LEAD_MINUTES = 15
+
+# 'rows' stores one Answer per question; 'document' keeps new attempts' answers in
+# StudentExam.answer_sheet (see manage.py answer_storage_benchmark)
+ANSWER_STORAGE = os.environ.get('ANSWER_STORAGE', 'rows')
+
+# Answer archive (manage.py archive_answers / restore_answers)
+ARCHIVE_AFTER_DAYS = 180
+
+# Admin changelists count at most this many rows; beyond it big unfiltered tables show the planner estimate
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Live proctoring (Quiz.proctoring): one snapshot per exam per tick, shared by all watchers.
+# The page polls once per tick with a short request, so watchers need no dedicated workers.
+PROCTOR_TICK_SECONDS = 2
+PROCTOR_IDLE_SECONDS = 120
+
+
+# Metrics (Quiz.metrics)
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', 0.1))
+METRICS_N_PLUS_ONE_THRESHOLD = 10
+METRICS_FLUSH_INTERVAL = 15
+METRICS_WORKER_TTL = 300
+# scrapers send "Authorization: Bearer <METRICS_TOKEN>"; the IP list is checked against the
+# client address resolved through RATELIMIT_TRUSTED_PROXIES, so proxied requests don't count as local
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_WORKER_SLOTS = 256
@@ -1,13 +1,10 @@
 # OnlineExam/urls.py
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('Quiz.urls')),  
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# فایل‌های آپلودشده عمومی سرو نمی‌شوند؛ دسترسی از طریق Quiz:answer_file است
\ No newline at end of file
@@ -1,5 +1,111 @@
-from django.contrib import admin
-from .models import User, Subject, Exam, Question, Choice, StudentExam, Answer
+import json
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connection
+from django.utils.functional import cached_property
+
+from . import search
+from .cloning import CloneError, clone_exam
+from .models import User, Subject, Exam, Question, Choice, Roster, StudentExam, Answer, SmsMessage, create_attempts
+
+
+def estimated_row_count(model):
+    """Planner statistics instead of COUNT(*); None where the database keeps none."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # بدون نقل‌قول، PostgreSQL نام Quiz_answer را به حروف کوچک تبدیل می‌کند
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [connection.ops.quote_name(model._meta.db_table)])
+        elif connection.vendor == 'mysql':
+            cursor.execute("SELECT table_rows FROM information_schema.tables "
+                           "WHERE table_schema = DATABASE() AND table_name = %s", [model._meta.db_table])
+        else:
+            return None
+        row = cursor.fetchone()
+    # reltuples برای جدولی که هنوز ANALYZE نشده -1 است
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def estimated_query_count(queryset):
+    """The planner's row estimate for a filtered queryset (PostgreSQL only)."""
+    if connection.vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.explain(format='json'))
+    return plan[0]['Plan']['Plan Rows']
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Big changelists are counted exactly only up to ADMIN_EXACT_COUNT_LIMIT;
+    beyond that the planner's estimate (table statistics when unfiltered, the
+    query plan otherwise) is used as the count, so every page stays reachable.
+    Databases without estimates fall back to COUNT(*).
+    """
+
+    @cached_property
+    def count(self):
+        limit = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+        queryset = self.object_list.order_by()
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model)
+            if estimate is not None and estimate > limit:
+                return estimate
+        counted = queryset[:limit + 1].count()
+        if counted <= limit:
+            return counted
+        estimate = estimated_query_count(queryset)
+        if estimate is None:
+            return queryset.count()
+        return max(estimate, counted)
+
+
+class RecentExamFilter(admin.SimpleListFilter):
+    """Offers only the latest exams (and the selected one) instead of every exam."""
+    title = 'exam'
+    parameter_name = 'exam'
+    field_path = 'exam'
+    size = 20
+
+    def lookups(self, request, model_admin):
+        exams = list(Exam.objects.order_by('-start_date').values_list('id', 'title')[:self.size])
+        selected = self.value()
+        if selected and selected.isdigit() and int(selected) not in {pk for pk, _ in exams}:
+            exams += list(Exam.objects.filter(pk=selected).values_list('id', 'title'))
+        return [(str(pk), title) for pk, title in exams]
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(**{f"{self.field_path}_id": self.value()})
+        return queryset
+
+
+class QuestionExamFilter(RecentExamFilter):
+    field_path = 'question__exam'
+
+
+class SoftDeleteAdmin(admin.ModelAdmin):
+    """Delete only marks the rows; `manage.py purge_deleted` removes them and their dependants."""
+    exclude = ('deleted_at',)
+
+    def get_deleted_objects(self, objs, request):
+        # فهرست کامل وابسته‌ها (پاسخ‌ها، سوال‌ها...) برای نمایش جمع‌آوری نمی‌شود
+        objs = list(objs)
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, set(), []
+
+    def delete_model(self, request, obj):
+        obj.soft_delete()
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            obj.soft_delete()
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # شمارش دوم (کل ردیف‌ها بدون فیلتر) انجام نمی‌شود
+    show_full_result_count = False
 
 
 @admin.register(User)
@@ -10,17 +116,45 @@ class UserAdmin(admin.ModelAdmin):
 
 
 @admin.register(Subject)
-class SubjectAdmin(admin.ModelAdmin):
+class SubjectAdmin(SoftDeleteAdmin):
     list_display = ('name', 'description')
     search_fields = ('name',)
 
 
 @admin.register(Exam)
-class ExamAdmin(admin.ModelAdmin):
+class ExamAdmin(SoftDeleteAdmin):
     list_display = ('title', 'subject', 'teacher', 'start_date', 'duration_minutes', 'total_score', 'created_at')
-    list_filter = ('subject', 'teacher', 'start_date')
+    list_filter = ('subject', ('teacher', admin.RelatedOnlyFieldListFilter), 'start_date')
+    list_select_related = ('subject', 'teacher')
+    autocomplete_fields = ('teacher', 'subject')
     search_fields = ('title', 'subject__name', 'teacher__username')
     date_hierarchy = 'start_date'
+    actions = ('clone_exams',)
+
+    @admin.action(description="کپی آزمون‌های انتخاب‌شده با سوال‌ها و گزینه‌ها")
+    def clone_exams(self, request, queryset):
+        try:
+            copies = [clone_exam(exam, [{'title': f"{exam.title} (کپی)"}])[0] for exam in queryset]
+        except CloneError as e:
+            self.message_user(request, str(e), messages.ERROR)
+            return
+        self.message_user(request, f"{len(copies)} آزمون کپی شد.")
+
+
+@admin.register(Roster)
+class RosterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'teacher', 'created_at')
+    list_select_related = ('teacher',)
+    autocomplete_fields = ('teacher', 'exams')
+    raw_id_fields = ('students',)
+    search_fields = ('name', 'teacher__username')
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        roster = form.instance
+        student_ids = list(roster.students.values_list('pk', flat=True))
+        for exam in roster.exams.open():
+            create_attempts(exam, student_ids)
 
 
 class ChoiceInline(admin.TabularInline):
@@ -31,27 +165,52 @@ class ChoiceInline(admin.TabularInline):
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
     list_display = ('text', 'exam', 'question_type', 'marks')
-    list_filter = ('question_type', 'exam')
+    list_filter = ('question_type', RecentExamFilter)
+    list_select_related = ('exam__subject',)
+    autocomplete_fields = ('exam',)
     search_fields = ('text',)
     inlines = [ChoiceInline]
 
+    def get_search_results(self, request, queryset, search_term):
+        # از نمایه‌ی متن کامل به جای ILIKE روی کل جدول سوال‌ها
+        if not search_term:
+            return queryset, False
+        # جداگانه اجرا می‌شود؛ SQL خام نمایه نام جدول را در زیرکوئری پیدا نمی‌کند
+        ids = [entry.object_id for entry in search.search(search_term, kinds=['question'], limit=1000)]
+        return queryset.filter(pk__in=ids), False
+
 
 @admin.register(Choice)
 class ChoiceAdmin(admin.ModelAdmin):
     list_display = ('question', 'text', 'is_correct')
     list_filter = ('is_correct',)
+    list_select_related = ('question__exam',)
+    raw_id_fields = ('question',)
     search_fields = ('text',)
 
 
 @admin.register(StudentExam)
-class StudentExamAdmin(admin.ModelAdmin):
+class StudentExamAdmin(LargeTableAdmin):
     list_display = ('student', 'exam', 'score', 'is_finished', 'joined_at', 'finished_at')
-    list_filter = ('is_finished', 'exam')
-    search_fields = ('student__username', 'exam__title')
+    list_filter = ('is_finished', RecentExamFilter)
+    list_select_related = ('student', 'exam__subject')
+    autocomplete_fields = ('student', 'exam')
+    search_fields = ('=student__username', 'exam__title')
+    exclude = ('answer_sheet',)
 
 
 @admin.register(Answer)
-class AnswerAdmin(admin.ModelAdmin):
+class AnswerAdmin(LargeTableAdmin):
     list_display = ('student_exam', 'question', 'marks_obtained', 'evaluated')
-    list_filter = ('evaluated', 'question__exam')
-    search_fields = ('student_exam__student__username', 'question__text')
+    list_filter = ('evaluated', QuestionExamFilter)
+    list_select_related = ('student_exam__student', 'student_exam__exam', 'question__exam')
+    raw_id_fields = ('student_exam', 'question', 'selected_choice')
+    # جستجوی icontains روی متن سوال کل جدول را پیمایش می‌کرد
+    search_fields = ('=student_exam__student__username',)
+
+
+@admin.register(SmsMessage)
+class SmsMessageAdmin(LargeTableAdmin):
+    list_display = ('phone', 'status', 'backend', 'created_at', 'sent_at')
+    list_filter = ('status', 'backend')
+    search_fields = ('phone',)
@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class QuizConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Quiz'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .log import start_listeners
+        start_listeners()
@@ -0,0 +1,92 @@
+"""
+Move the Answer rows of old, fully graded attempts into ArchivedAttempt and
+back. Each batch is one transaction, so an attempt is always either hot or
+archived; StudentExam.get_answers() reads whichever side holds it.
+"""
+import time
+
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import Answer, ArchivedAttempt, StudentExam
+
+
+def archivable(cutoff):
+    return StudentExam.objects.with_grading_status().filter(
+        is_finished=True, finished_at__lt=cutoff, archived_at__isnull=True, has_pending_answers=False,
+        # پاسخ‌نامه‌های سندی همین حالا هم یک ردیف فشرده‌اند
+        answer_sheet__isnull=True,
+    )
+
+
+def _batches(queryset, batch_size):
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        yield ids[start:start + batch_size]
+
+
+def archive_attempts(queryset, batch_size=500):
+    """Archive the attempts in `queryset`; returns (attempts, answers) moved."""
+    attempts = answers = 0
+    for ids in _batches(queryset, batch_size):
+        with transaction.atomic():
+            rows = {pk: [] for pk in ids}
+            for row in Answer.objects.filter(student_exam_id__in=ids).order_by('pk').values_list(
+                    'student_exam_id', *ArchivedAttempt.FIELDS):
+                rows[row[0]].append(row[1:])
+            ArchivedAttempt.objects.bulk_create([
+                ArchivedAttempt(student_exam_id=pk, payload=ArchivedAttempt.pack(sheet), answer_count=len(sheet))
+                for pk, sheet in rows.items()
+            ])
+            answers += Answer.objects.filter(student_exam_id__in=ids).delete()[0]
+            StudentExam.objects.filter(pk__in=ids).update(archived_at=timezone.now())
+        attempts += len(ids)
+    return attempts, answers
+
+
+def restore_attempts(queryset, batch_size=500):
+    """Move archived attempts in `queryset` back into Answer; returns (attempts, answers)."""
+    attempts = answers = 0
+    for ids in _batches(queryset.filter(archived_at__isnull=False), batch_size):
+        with transaction.atomic():
+            restored = [
+                Answer(student_exam_id=archive.student_exam_id, **row)
+                for archive in ArchivedAttempt.objects.filter(student_exam_id__in=ids)
+                for row in archive.rows()
+            ]
+            Answer.objects.bulk_create(restored, batch_size=1000)
+            ArchivedAttempt.objects.filter(student_exam_id__in=ids).delete()
+            StudentExam.objects.filter(pk__in=ids).update(archived_at=None)
+        attempts += len(ids)
+        answers += len(restored)
+    return attempts, answers
+
+
+def table_bytes(model):
+    """On-disk size of a model's table and indexes, where the database can tell."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT pg_total_relation_size(%s)", [connection.ops.quote_name(table)])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)", [table, table])
+            except DatabaseError:
+                # SQLite بدون SQLITE_ENABLE_DBSTAT_VTAB
+                return None
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+def read_latency(student_exam_ids):
+    """Mean seconds for get_answers() over the given attempts."""
+    attempts = list(StudentExam.objects.filter(pk__in=student_exam_ids))
+    if not attempts:
+        return None
+    start = time.perf_counter()
+    for attempt in attempts:
+        attempt.get_answers()
+    return (time.perf_counter() - start) / len(attempts)
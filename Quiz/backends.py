@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+
+# فیلدهایی که request.user در هر درخواست لازم دارد؛ بقیه (از جمله رمز، ایمیل و تلفن) deferred می‌مانند
+SNAPSHOT_FIELDS = ('id', 'username', 'user_type', 'is_active', 'is_staff', 'is_superuser')
+
+
+def user_cache_key(user_id):
+    return f"quiz:user:{user_id}"
+
+
+def invalidate_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def invalidate_users(user_ids):
+    cache.delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+def make_snapshot(user):
+    snapshot = {field: getattr(user, field) for field in SNAPSHOT_FIELDS}
+    # نسخه‌ی هش رمز؛ با تغییر رمز عوض می‌شود و نشست‌های قبلی را باطل می‌کند. خود هش در کش نمی‌رود
+    snapshot['session_auth_hash'] = user.get_session_auth_hash()
+    return snapshot
+
+
+def warm_users(users):
+    cache.set_many({user_cache_key(user.pk): make_snapshot(user) for user in users},
+                   getattr(settings, 'USER_CACHE_TIMEOUT', 3600))
+
+
+def user_from_snapshot(snapshot):
+    """The cached fields as a User (the rest deferred), or None if the snapshot has another shape."""
+    if snapshot.keys() != {*SNAPSHOT_FIELDS, 'session_auth_hash'}:
+        return None
+    User = get_user_model()
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in SNAPSHOT_FIELDS]
+    user = User.from_db(router.db_for_read(User), names, [snapshot[name] for name in names])
+    user._session_auth_hash = snapshot['session_auth_hash']
+    return user
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend whose get_user() is served from a cached snapshot of the
+    user, so AuthenticationMiddleware does not query the user table on every
+    request. Snapshots are dropped from Quiz.signals whenever a user is saved
+    or deleted, and by UserQuerySet.update().
+    """
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        snapshot = cache.get(key)
+        user = user_from_snapshot(snapshot) if snapshot is not None else None
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, make_snapshot(user), getattr(settings, 'USER_CACHE_TIMEOUT', 3600))
+            return user
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,77 @@
+"""
+Version-keyed caching for shared view data and template fragments.
+
+Every cached entry is keyed by the current version of the scopes it depends
+on (``'subjects'``, ``'exams'``, ``'exam:<id>'``). Quiz.signals bumps those
+versions when a Subject, Exam or Question is saved or deleted, so stale
+entries are never read again; the timeout only bounds memory. Only content
+that is identical for every user may be cached this way.
+"""
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_PREFIX = 'quiz:ver:'
+FRAGMENT_PREFIX = 'quiz:frag:'
+
+# شمارنده‌های hit/miss در همین پردازه
+stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        stats[f"{name}:{outcome}"] += 1
+
+
+def exam_scope(exam_id):
+    return f"exam:{exam_id}"
+
+
+def bump_version(*scopes):
+    cache.set_many({VERSION_PREFIX + scope: time.time_ns() for scope in scopes}, None)
+
+
+def get_versions(scopes):
+    keys = [VERSION_PREFIX + scope for scope in scopes]
+    found = cache.get_many(keys)
+    versions = {}
+    for scope, key in zip(scopes, keys):
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions[scope] = found[key]
+    return versions
+
+
+def versioned_key(name, scopes):
+    versions = get_versions(scopes)
+    raw = ';'.join(f"{scope}={versions[scope]}" for scope in scopes)
+    return FRAGMENT_PREFIX + name + ':' + hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+
+
+def get_or_build(name, scopes, build):
+    key = versioned_key(name, list(scopes))
+    value = cache.get(key)
+    if value is not None:
+        _count(name, 'hit')
+        return value
+    _count(name, 'miss')
+    value = build()
+    cache.set(key, value, getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 3600 * 24))
+    return value
+
+
+def cached_subjects():
+    from .models import Subject
+
+    return get_or_build('subjects', ['subjects'], lambda: list(Subject.objects.all()))
+
+
+def fragment_stats():
+    with _stats_lock:
+        return dict(stats)
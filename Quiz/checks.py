@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    # نشست‌های کش‌شده، تجمیع متریک‌ها و شمارنده‌های محدودیت نرخ به کش مشترک نیاز دارند
+    if getattr(settings, 'CACHE_IS_SHARED', True):
+        return []
+    return [Warning(
+        "CACHES['default'] is local to each process.",
+        hint="Set CACHE_BACKEND/CACHE_LOCATION to Redis or Memcached when running more than one worker; "
+             "until then sessions use the plain database engine, /metrics only sees its own worker and "
+             "rate limits are counted per process.",
+        id='Quiz.W001',
+    )]
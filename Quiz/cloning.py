@@ -0,0 +1,53 @@
+"""
+Copy an exam with its questions and choices, e.g. once per class section
+for a new term. The copies are written with three bulk INSERTs (exams,
+questions, choices) in one transaction however many targets there are;
+foreign keys are remapped from the primary keys bulk_create returns. The
+copies are then added to the search index in one upsert.
+"""
+from django.db import connection, transaction
+
+from . import search
+from .cache import bump_version
+from .models import Choice, Exam, Question
+
+EXAM_FIELDS = ('teacher_id', 'subject_id', 'title', 'description', 'start_date', 'duration_minutes', 'total_score')
+QUESTION_FIELDS = ('question_type', 'text', 'marks', 'model_answer')
+CHOICE_FIELDS = ('text', 'is_correct')
+
+
+class CloneError(Exception):
+    pass
+
+
+def _copy(obj, fields, **overrides):
+    values = {name: getattr(obj, name) for name in fields}
+    values.update(overrides)
+    return type(obj)(**values)
+
+
+def clone_exam(exam, targets):
+    """
+    Create one copy of `exam` per dict in `targets` (Exam field overrides such
+    as title, start_date or teacher_id) and return the new exams.
+    """
+    if not connection.features.can_return_rows_from_bulk_insert:
+        raise CloneError("Cloning needs a database that returns primary keys from bulk inserts.")
+    questions = list(exam.questions.order_by('pk'))
+    choices = list(Choice.objects.filter(question__exam=exam).order_by('pk'))
+
+    with transaction.atomic():
+        exams = Exam.objects.bulk_create([_copy(exam, EXAM_FIELDS, **overrides) for overrides in targets])
+        copies = Question.objects.bulk_create([
+            _copy(question, QUESTION_FIELDS, exam_id=new_exam.pk) for new_exam in exams for question in questions
+        ], batch_size=1000)
+        # copies[i * len(questions) + j] is question j of exam i
+        position = {question.pk: j for j, question in enumerate(questions)}
+        Choice.objects.bulk_create([
+            _copy(choice, CHOICE_FIELDS, question_id=copies[i * len(questions) + position[choice.question_id]].pk)
+            for i in range(len(exams)) for choice in choices
+        ], batch_size=1000)
+    # bulk_create سیگنال post_save نمی‌فرستد
+    bump_version('exams')
+    search.index(exams + copies)
+    return exams
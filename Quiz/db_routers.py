@@ -0,0 +1,74 @@
+"""
+Send designated read-only work to the `replica` database alias.
+
+Reads go to the replica only inside views decorated with ``read_replica``
+(or querysets passed through ``replica()``), only when a `replica` alias is
+configured, and never for a client that wrote to the primary within the last
+REPLICA_STICKY_SECONDS (see ReplicaStickinessMiddleware).
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+REPLICA = 'replica'
+# نوشتن در این اپ‌ها باعث چسبیدن کاربر به دیتابیس اصلی نمی‌شود
+STICKY_EXEMPT_APPS = {'sessions'}
+
+_use_replica = ContextVar('quiz_use_replica', default=False)
+_pinned = ContextVar('quiz_pinned_to_primary', default=False)
+# فقط داخل یک درخواست (بین begin_request و end_request) مقدار دارد
+_wrote = ContextVar('quiz_wrote_primary', default=None)
+
+
+def replica_available():
+    return REPLICA in settings.DATABASES and not _pinned.get() and not _wrote.get()
+
+
+def read_alias():
+    return REPLICA if replica_available() else 'default'
+
+
+def replica(queryset):
+    return queryset.using(read_alias())
+
+
+def read_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _use_replica.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+
+def begin_request(pinned):
+    return _pinned.set(pinned), _wrote.set(False)
+
+
+def end_request(tokens):
+    wrote = _wrote.get()
+    pinned_token, wrote_token = tokens
+    _wrote.reset(wrote_token)
+    _pinned.reset(pinned_token)
+    return wrote
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_available():
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        if _wrote.get() is not None and model._meta.app_label not in STICKY_EXEMPT_APPS:
+            _wrote.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
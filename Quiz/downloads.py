@@ -0,0 +1,125 @@
+"""
+Serve stored files after the view has checked access.
+
+With FILE_DOWNLOAD_ACCEL set, Django only sends headers and the web server
+streams the file: 'x-accel-redirect' (nginx, an `internal` location mapping
+FILE_DOWNLOAD_ACCEL_PREFIX to MEDIA_ROOT) or 'x-sendfile' (Apache
+mod_xsendfile, lighttpd). Otherwise Django serves it with single-range
+support, conditional GET and the WSGI file wrapper for whole files.
+"""
+import mimetypes
+import os
+import re
+from stat import S_ISREG
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def _disposition(filename, as_attachment):
+    kind = 'attachment' if as_attachment else 'inline'
+    return f"{kind}; filename*=UTF-8''{quote(filename)}"
+
+
+def _finish(response, filename, as_attachment, content_type):
+    response['Content-Type'] = content_type
+    response['Content-Disposition'] = _disposition(filename, as_attachment)
+    response['X-Content-Type-Options'] = 'nosniff'
+    # پاسخ به کاربر وابسته است و نباید در کش‌های مشترک بماند
+    patch_cache_control(response, private=True, max_age=getattr(settings, 'FILE_DOWNLOAD_MAX_AGE', 3600))
+    return response
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def parse_range(header, size):
+    """(start, end) for a single satisfiable byte range, None to ignore, or False when unsatisfiable."""
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        # بازه‌های چندتایی پشتیبانی نمی‌شوند؛ کل فایل فرستاده می‌شود
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def serve_file(request, fieldfile, filename=None, as_attachment=True):
+    filename = filename or os.path.basename(fieldfile.name)
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    accel = getattr(settings, 'FILE_DOWNLOAD_ACCEL', '')
+
+    try:
+        path = fieldfile.path
+    except NotImplementedError:
+        # فضای ذخیره‌سازی غیرمحلی؛ فقط پخش ساده
+        try:
+            return _finish(FileResponse(fieldfile.open('rb')), filename, as_attachment, content_type)
+        except (FileNotFoundError, IsADirectoryError):
+            raise Http404
+
+    if accel == 'x-accel-redirect':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = quote(getattr(settings, 'FILE_DOWNLOAD_ACCEL_PREFIX', '/protected-media/')
+                                             + fieldfile.name)
+        return _finish(response, filename, as_attachment, content_type)
+    if accel == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return _finish(response, filename, as_attachment, content_type)
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        # فایل پاک‌شده (Quiz.purge) یا هرگز ذخیره‌نشده
+        raise Http404
+    if not S_ISREG(stat.st_mode):
+        raise Http404
+    etag = quote_etag(f"{stat.st_size:x}-{int(stat.st_mtime):x}")
+    modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+    if request.headers.get('If-None-Match') == etag or (
+            'If-None-Match' not in request.headers and modified_since and int(stat.st_mtime) <= modified_since):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    byte_range = None
+    if request.headers.get('If-Range', etag) == etag:
+        byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{stat.st_size}"
+        return response
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206)
+        response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+        response['Content-Length'] = end - start + 1
+    else:
+        response = FileResponse(open(path, 'rb'))
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    return _finish(response, filename, as_attachment, content_type)
@@ -0,0 +1,17 @@
+from django.core.mail import EmailMessage
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from .tokens import account_activation_token
+
+
+def activation_email(user, domain, to_email=None):
+    mail_subject = 'فعال‌سازی حساب کاربری'
+    message = render_to_string('acc_active_email.html', {
+        'user': user,
+        'domain': domain,
+        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
+        'token': account_activation_token.make_token(user),
+    })
+    return EmailMessage(mail_subject, message, to=[to_email or user.email])
@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 
-from .models import User, Exam, Question, Choice, Answer
+from .models import User, Exam, Question, Choice, Answer, Roster
 
 
 class TeacherRegistrationForm(UserCreationForm):
@@ -31,6 +31,11 @@ class StudentRegistrationForm(UserCreationForm):
 
 
 class ExamForm(forms.ModelForm):
+    rosters = forms.ModelMultipleChoiceField(
+        queryset=Roster.objects.none(), required=False, widget=forms.CheckboxSelectMultiple,
+        help_text="دانش‌آموزان کلاس‌های انتخاب‌شده از پیش در آزمون ثبت‌نام می‌شوند.",
+    )
+
     class Meta:
         model = Exam
         fields = ['subject', 'title', 'description', 'start_date', 'duration_minutes', 'total_score']
@@ -38,6 +43,37 @@ class ExamForm(forms.ModelForm):
             'start_date': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
         }
 
+    def __init__(self, *args, teacher=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['rosters'].queryset = Roster.objects.filter(teacher=teacher)
+        if self.instance.pk:
+            self.fields['rosters'].initial = self.instance.rosters.all()
+
+
+class RosterForm(forms.ModelForm):
+    usernames = forms.CharField(
+        widget=forms.Textarea(attrs={'rows': 8}), required=False,
+        help_text="نام کاربری دانش‌آموزان، هر خط یکی.",
+    )
+
+    class Meta:
+        model = Roster
+        fields = ['name']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk and not self.is_bound:
+            self.fields['usernames'].initial = '\n'.join(
+                self.instance.students.order_by('username').values_list('username', flat=True))
+
+    def clean_usernames(self):
+        names = {line.strip() for line in self.cleaned_data['usernames'].splitlines() if line.strip()}
+        students = list(User.students.filter(username__in=names))
+        missing = names - {s.username for s in students}
+        if missing:
+            raise forms.ValidationError("دانش‌آموزی با این نام کاربری پیدا نشد: " + '، '.join(sorted(missing)))
+        return students
+
 
 class QuestionForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,134 @@
+"""
+Logging helpers: a queue handler whose background listener owns the real
+(file/console) handlers, a JSON formatter, a filter that stamps records with
+the current request's id/user/view, and a per-logger sampling filter.
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from contextvars import ContextVar
+
+request_context = ContextVar('quiz_log_context', default={})
+
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        context = request_context.get()
+        record.request_id = context.get('request_id')
+        record.user_id = context.get('user_id')
+        record.view_name = context.get('view_name')
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records below WARNING from noisy loggers, e.g.
+    ``rates={'django.server': 0.1}``. Names match the logger and its children.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        name = record.name
+        while name:
+            if name in self.rates:
+                return random.random() < self.rates[name]
+            name = name.rpartition('.')[0]
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'process': record.process,
+            'request_id': getattr(record, 'request_id', None),
+            'user_id': getattr(record, 'user_id', None),
+            'view': getattr(record, 'view_name', None),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload['exc_info'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+_queue_handlers = []
+
+
+class QueueListenerHandler(logging.handlers.QueueHandler):
+    """
+    Request threads only put records on an in-memory queue; a listener thread
+    passes them to the handlers of the `sink` logger, which are declared as
+    usual in LOGGING on a logger nobody logs to. QuizConfig.ready() starts the
+    listeners; records emitted before that wait in the queue. The queue is
+    unbounded and is drained at interpreter exit, so no record is dropped on
+    shutdown.
+    """
+
+    def __init__(self, sink='quiz.log.sink'):
+        super().__init__(queue.SimpleQueue())
+        self.sink = sink
+        self.listener = None
+        self.listener_pid = None
+        self.start_lock = threading.Lock()
+        _queue_handlers.append(self)
+
+    def start(self):
+        with self.start_lock:
+            if self.listener is not None and self.listener_pid == os.getpid():
+                return
+            targets = logging.getLogger(self.sink).handlers
+            self.listener = logging.handlers.QueueListener(self.queue, *targets, respect_handler_level=True)
+            self.listener.start()
+            self.listener_pid = os.getpid()
+
+    def stop(self):
+        with self.start_lock:
+            if self.listener is not None and self.listener_pid == os.getpid():
+                self.listener.stop()
+            self.listener = None
+
+    def prepare(self, record):
+        # پیام و traceback در همین thread قالب‌بندی می‌شوند تا آرگومان‌های
+        # قابل تغییر بعداً در thread دیگر خوانده نشوند
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record):
+        # thread شنونده پس از fork (مثلاً gunicorn --preload) در فرزند وجود ندارد
+        if self.listener_pid is not None and self.listener_pid != os.getpid():
+            self.start()
+        super().emit(record)
+
+
+def start_listeners():
+    for handler in _queue_handlers:
+        handler.start()
+
+
+@atexit.register
+def stop_listeners():
+    for handler in _queue_handlers:
+        handler.stop()
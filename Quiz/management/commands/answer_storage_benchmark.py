@@ -0,0 +1,97 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from Quiz.models import Answer, Choice, Exam, Question, StudentExam, Subject, User
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+PHASES = ('autosave', 'submit', 'result')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Answer rows with per-attempt answer sheets (ANSWER_STORAGE='document') for "
+        "autosave, submit and result. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=100)
+        parser.add_argument('--questions', type=int, default=50)
+        parser.add_argument('--autosaves', type=int, default=10, help="Single-answer autosaves per attempt.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'layout':<10} {'phase':<9} {'ops':>6} {'ms/op':>8} {'queries/op':>11} {'writes/op':>10} {'answer rows':>12}"
+        )
+        with transaction.atomic():
+            for mode in ('rows', 'document'):
+                with override_settings(ANSWER_STORAGE=mode):
+                    for phase, ops, seconds, queries, writes, rows in self.run(mode, options):
+                        self.stdout.write(
+                            f"{mode:<10} {phase:<9} {ops:>6} {seconds / ops * 1000:>8.2f} "
+                            f"{queries / ops:>11.2f} {writes / ops:>10.2f} {rows:>12}"
+                        )
+            transaction.set_rollback(True)
+
+    def run(self, mode, options):
+        rng = random.Random(options['seed'])
+        teacher = User.objects.create(username=f"bench_{mode}_teacher", user_type='teacher')
+        students = User.objects.bulk_create([
+            User(username=f"bench_{mode}_s{i}", user_type='student') for i in range(options['students'])
+        ])
+        exam = Exam.objects.create(teacher=teacher, subject=Subject.objects.create(name=f"bench {mode}"),
+                                   title=f"bench {mode}", start_date=timezone.now(), duration_minutes=60,
+                                   total_score=options['questions'])
+        questions = Question.objects.bulk_create([
+            Question(exam=exam, question_type=('mcq', 'short')[n % 2], text=f"q{n}", marks=1)
+            for n in range(options['questions'])
+        ])
+        choices = {}
+        for choice in Choice.objects.bulk_create([
+            Choice(question=q, text=str(c), is_correct=c == 0)
+            for q in questions if q.question_type == 'mcq' for c in range(4)
+        ]):
+            choices.setdefault(choice.question_id, []).append(choice.id)
+        attempts = StudentExam.objects.bulk_create([
+            StudentExam(student=s, exam=exam, started_at=timezone.now()) for s in students
+        ])
+        for attempt in attempts:
+            attempt.exam = exam
+
+        def form_value(question):
+            if question.question_type == 'mcq':
+                return str(rng.choice(choices[question.id]))
+            return 'answer'
+
+        def autosave(attempt):
+            for _ in range(options['autosaves']):
+                question = rng.choice(questions)
+                attempt.save_answers({f"question_{question.id}": form_value(question)})
+
+        steps = {
+            'autosave': autosave,
+            'submit': lambda attempt: attempt.submit(),
+            'result': lambda attempt: attempt.get_answers(),
+        }
+        for phase in PHASES:
+            # CaptureQueriesContext فقط ۹۰۰۰ کوئری آخر را نگه می‌دارد
+            counts = {'queries': 0, 'writes': 0}
+
+            def count(execute, sql, params, many, context):
+                counts['queries'] += 1
+                counts['writes'] += sql.lstrip().upper().startswith(WRITE_PREFIXES)
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(count):
+                began = time.perf_counter()
+                for attempt in attempts:
+                    steps[phase](attempt)
+                seconds = time.perf_counter() - began
+            ops = len(attempts) * (options['autosaves'] if phase == 'autosave' else 1)
+            rows = Answer.objects.filter(student_exam__exam=exam).count()
+            yield phase, ops, seconds, counts['queries'], counts['writes'], rows
@@ -0,0 +1,59 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from Quiz.archive import archivable, archive_attempts, read_latency, table_bytes
+from Quiz.models import Answer, ArchivedAttempt
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the answers of fully graded attempts finished before a cutoff into compressed "
+        "per-attempt archive rows, and report table sizes and read latency before and after."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help="Cutoff date (YYYY-MM-DD) on finished_at.")
+        parser.add_argument('--older-than-days', type=int,
+                            default=getattr(settings, 'ARCHIVE_AFTER_DAYS', 180),
+                            help="Cutoff as an age in days, used when --before is not given.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Attempts per transaction.")
+        parser.add_argument('--sample', type=int, default=50, help="Attempts used to measure read latency.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be archived.")
+
+    def handle(self, *args, before, older_than_days, batch_size, sample, dry_run, **options):
+        if before:
+            day = parse_date(before)
+            if day is None:
+                raise CommandError(f"Invalid date: {before}")
+            cutoff = timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time()))
+        else:
+            cutoff = timezone.now() - timezone.timedelta(days=older_than_days)
+
+        queryset = archivable(cutoff)
+        ids = list(queryset.values_list('pk', flat=True))
+        self.stdout.write(f"{len(ids)} attempts finished before {cutoff:%Y-%m-%d} are fully graded and hot")
+        if dry_run or not ids:
+            return
+
+        sampled = random.sample(ids, min(sample, len(ids)))
+        before_sizes = table_bytes(Answer), table_bytes(ArchivedAttempt)
+        before_latency = read_latency(sampled)
+
+        began = time.monotonic()
+        attempts, answers = archive_attempts(queryset.filter(pk__in=ids), batch_size)
+        elapsed = time.monotonic() - began
+
+        after_sizes = table_bytes(Answer), table_bytes(ArchivedAttempt)
+        after_latency = read_latency(sampled)
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {answers} answers of {attempts} attempts in {elapsed:.2f}s"))
+        for name, old, new in (('Answer', before_sizes[0], after_sizes[0]),
+                               ('ArchivedAttempt', before_sizes[1], after_sizes[1])):
+            if old is not None:
+                self.stdout.write(f"  {name} table: {old / 1024:.0f} KiB -> {new / 1024:.0f} KiB")
+        self.stdout.write(f"  get_answers(): {before_latency * 1000:.2f} ms hot -> {after_latency * 1000:.2f} ms archived")
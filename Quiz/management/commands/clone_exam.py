@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from Quiz.cloning import CloneError, clone_exam
+from Quiz.models import Exam, User
+
+
+class Command(BaseCommand):
+    help = "Copy an exam with all its questions and choices, once per --section (or once)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--section', action='append', default=[],
+                            help="Create one copy titled '<title> - <section>'; repeat for several sections.")
+        parser.add_argument('--title', help="Title of the copies (before the section suffix).")
+        parser.add_argument('--start', help="New start date, e.g. 2026-02-01T09:00.")
+        parser.add_argument('--teacher', help="Username of the teacher who owns the copies.")
+
+    def handle(self, *args, exam_id, section, title, start, teacher, **options):
+        try:
+            exam = Exam.objects.get(pk=exam_id)
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {exam_id} does not exist")
+
+        overrides = {}
+        if start:
+            start_date = parse_datetime(start)
+            if start_date is None:
+                raise CommandError(f"Invalid date: {start}")
+            overrides['start_date'] = timezone.make_aware(start_date) if timezone.is_naive(start_date) else start_date
+        if teacher:
+            try:
+                overrides['teacher_id'] = User.teachers.get(username=teacher).pk
+            except User.DoesNotExist:
+                raise CommandError(f"Teacher {teacher} does not exist")
+        title = title or exam.title
+        targets = [{**overrides, 'title': f"{title} - {name}"} for name in section] or [{**overrides, 'title': title}]
+
+        began = time.monotonic()
+        try:
+            exams = clone_exam(exam, targets)
+        except CloneError as e:
+            raise CommandError(str(e))
+        elapsed = time.monotonic() - began
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(exams)} copies of {exam.title} in {elapsed * 1000:.0f} ms: "
+            + ', '.join(f"#{e.pk} {e.title}" for e in exams)
+        ))
@@ -0,0 +1,312 @@
+import json
+import math
+import random
+import string
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.cookiejar import CookieJar
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from Quiz.models import Answer, Choice, Exam, Question, StudentExam, Subject, User
+
+QUESTION_TYPES = ('mcq', 'short', 'long', 'file')
+SCENARIOS = ('mass_enroll', 'take_exam', 'autosave_burst', 'deadline_submit', 'teacher_grading')
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    # nearest-rank: کوچک‌ترین مقداری که دست‌کم pct درصد نمونه‌ها از آن کوچک‌تر یا برابرند
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class ClientDriver:
+    """Drive views in-process through django.test.Client, counting queries."""
+
+    def __init__(self, user):
+        self.client = Client()
+        self.client.force_login(user)
+
+    def request(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, data or {})
+            elapsed = time.perf_counter() - start
+        return response.status_code, elapsed, len(ctx.captured_queries)
+
+
+class HttpDriver:
+    """Drive a running server over HTTP with a session created for the user."""
+
+    def __init__(self, user, base_url):
+        self.base_url = base_url.rstrip('/')
+        client = Client()
+        client.force_login(user)
+        self.csrf = ''.join(random.choices(string.ascii_letters + string.digits, k=32))
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(_NoRedirect, urllib.request.HTTPCookieProcessor(self.cookies))
+        self.headers = {
+            'Cookie': f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}; "
+                      f"{settings.CSRF_COOKIE_NAME}={self.csrf}",
+            'X-CSRFToken': self.csrf,
+            'Referer': self.base_url + '/',
+        }
+
+    def request(self, method, url, data=None):
+        body = urllib.parse.urlencode(data or {}, doseq=True).encode() if method == 'post' else None
+        request = urllib.request.Request(self.base_url + url, data=body, method=method.upper(), headers=self.headers)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError:
+            status = 599
+        return status, time.perf_counter() - start, None
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic exam-day dataset, replay exam scenarios against it and print "
+        "throughput, latency percentiles and queries per request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--exams', type=int, default=4, help="Finished exams with historical answers.")
+        parser.add_argument('--questions', type=int, default=20, help="Questions per exam.")
+        parser.add_argument('--autosaves', type=int, default=5, help="Autosave requests per student.")
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--driver', choices=('client', 'http'), default='client')
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--prefix', default='loadtest', help="Prefix for every seeded username and title.")
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+        parser.add_argument('--keep-data', action='store_true', help="Do not delete the seeded data afterwards.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        scenarios = [s.strip() for s in options['scenarios'].split(',') if s.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Data with prefix {options['prefix']!r} already exists; use another --prefix")
+
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        began = time.perf_counter()
+        try:
+            self.seed()
+            seeded = time.perf_counter() - began
+            # Client درخواست‌ها را با میزبان testserver می‌فرستد
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                results = {name: self.run_scenario(name) for name in scenarios}
+        finally:
+            if not options['keep_data']:
+                self.cleanup()
+
+        report = {
+            'meta': {
+                'at': timezone.now().isoformat(),
+                'driver': options['driver'],
+                'students': options['students'],
+                'exams': options['exams'],
+                'questions': options['questions'],
+                'concurrency': options['concurrency'],
+                'seed_seconds': round(seeded, 3),
+            },
+            'scenarios': results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output + '\n')
+        self.stdout.write(output)
+
+    # --- dataset ---------------------------------------------------------
+
+    @transaction.atomic
+    def seed(self):
+        prefix, o = self.options['prefix'], self.options
+        password = make_password(prefix)
+        self.teacher = User.objects.create(
+            username=f"{prefix}_teacher", user_type='teacher', password=password, is_active=True,
+        )
+        self.students = User.objects.bulk_create([
+            User(username=f"{prefix}_s{i}", user_type='student', password=password, is_active=True)
+            for i in range(o['students'])
+        ])
+        subject = Subject.objects.create(name=f"{prefix} subject")
+
+        now = timezone.now()
+        past = [
+            Exam(teacher=self.teacher, subject=subject, title=f"{prefix} past {i}",
+                 start_date=now - timedelta(days=7 * (i + 1)), duration_minutes=60, total_score=o['questions'])
+            for i in range(o['exams'])
+        ]
+        self.live_exam = Exam(teacher=self.teacher, subject=subject, title=f"{prefix} live",
+                              start_date=now - timedelta(minutes=5), duration_minutes=120,
+                              total_score=o['questions'])
+        exams = Exam.objects.bulk_create([*past, self.live_exam])
+        self.past_exams, self.live_exam = exams[:-1], exams[-1]
+
+        questions = Question.objects.bulk_create([
+            Question(exam=exam, question_type=QUESTION_TYPES[n % len(QUESTION_TYPES)],
+                     text=f"Question {n}", marks=1, model_answer='answer')
+            for exam in exams for n in range(o['questions'])
+        ])
+        choices = Choice.objects.bulk_create([
+            Choice(question=q, text=f"Choice {c}", is_correct=(c == 0))
+            for q in questions if q.question_type == 'mcq' for c in range(4)
+        ])
+        self.questions_by_exam = {}
+        for q in questions:
+            self.questions_by_exam.setdefault(q.exam_id, []).append(q)
+        self.choices_by_question = {}
+        for c in choices:
+            self.choices_by_question.setdefault(c.question_id, []).append(c)
+
+        attempts = StudentExam.objects.bulk_create([
+            StudentExam(student=s, exam=exam, started_at=exam.start_date, answer_sheet=None,
+                        finished_at=exam.start_date + timedelta(minutes=50), is_finished=True)
+            for exam in self.past_exams for s in self.students
+        ], batch_size=2000)
+        answers = []
+        for attempt in attempts:
+            for q in self.questions_by_exam[attempt.exam_id]:
+                answers.append(self.historical_answer(attempt, q))
+        Answer.objects.bulk_create(answers, batch_size=5000)
+        self.past_attempts = attempts
+
+    def historical_answer(self, attempt, question):
+        answer = Answer(student_exam=attempt, question=question)
+        if question.question_type == 'mcq':
+            answer.selected_choice = self.rng.choice(self.choices_by_question[question.id])
+            answer.marks_obtained = question.marks if answer.selected_choice.is_correct else 0
+            answer.evaluated = True
+        elif question.question_type == 'file':
+            answer.uploaded_file = f"answers/files/{self.options['prefix']}.txt"
+        else:
+            answer.answer_text = 'answer' if self.rng.random() < 0.5 else 'something else'
+            answer.evaluated = self.rng.random() < 0.5
+        return answer
+
+    def cleanup(self):
+        prefix = self.options['prefix']
+        User.objects.filter(username__startswith=f"{prefix}_").delete()
+        Subject.objects.filter(name=f"{prefix} subject").delete()
+
+    # --- scenarios -------------------------------------------------------
+
+    def driver_for(self, user):
+        if self.options['driver'] == 'http':
+            return HttpDriver(user, self.options['base_url'])
+        return ClientDriver(user)
+
+    def submission_data(self, exam):
+        data = {}
+        for q in self.questions_by_exam[exam.id]:
+            if q.question_type == 'mcq':
+                data[f"question_{q.id}"] = self.rng.choice(self.choices_by_question[q.id]).id
+            elif q.question_type in ('short', 'long'):
+                data[f"question_{q.id}"] = 'answer'
+        return data
+
+    def student_attempt_url(self, student, name):
+        attempt = StudentExam.objects.filter(student=student, exam=self.live_exam).first()
+        if attempt is None:
+            attempt = StudentExam.objects.create(student=student, exam=self.live_exam, started_at=timezone.now())
+        return reverse(name, args=[attempt.id])
+
+    def student_tasks(self, name):
+        exam = self.live_exam
+        for student in self.students:
+            if name == 'mass_enroll':
+                yield student, [('get', reverse('Quiz:enroll_exam', args=[exam.id]), None)]
+            elif name == 'take_exam':
+                yield student, [('get', self.student_attempt_url(student, 'Quiz:take_exam'), None)]
+            elif name == 'autosave_burst':
+                url = self.student_attempt_url(student, 'Quiz:autosave_answer')
+                fields = list(self.submission_data(exam).items())
+                yield student, [('post', url, dict([self.rng.choice(fields)]))
+                                for _ in range(self.options['autosaves'])]
+            elif name == 'deadline_submit':
+                url = self.student_attempt_url(student, 'Quiz:take_exam')
+                yield student, [('post', url, self.submission_data(exam))]
+
+    def teacher_tasks(self):
+        steps = [('get', reverse('Quiz:teacher_dashboard'), None)]
+        for exam in self.past_exams:
+            steps.append(('get', reverse('Quiz:grade_exam', args=[exam.id]), None))
+        for attempt in self.past_attempts[:self.options['students']]:
+            url = reverse('Quiz:grade_student_answers', args=[attempt.id])
+            steps += [('get', url, None), ('post', url, {})]
+        yield self.teacher, steps
+
+    def run_scenario(self, name):
+        tasks = list(self.teacher_tasks() if name == 'teacher_grading' else self.student_tasks(name))
+        concurrency = max(1, min(self.options['concurrency'], len(tasks)))
+        chunks = [tasks[i::concurrency] for i in range(concurrency)]
+
+        start = time.perf_counter()
+        if concurrency == 1:
+            samples = self.run_tasks(chunks[0], close_connection=False)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                samples = [s for chunk in pool.map(self.run_tasks, chunks) for s in chunk]
+        elapsed = time.perf_counter() - start
+
+        latencies = [s[1] * 1000 for s in samples]
+        queries = [s[2] for s in samples if s[2] is not None]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for s in samples if s[0] >= 400),
+            'seconds': round(elapsed, 3),
+            'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+            'latency_ms': {
+                'mean': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                'p50': round(percentile(latencies, 50), 2) if latencies else None,
+                'p95': round(percentile(latencies, 95), 2) if latencies else None,
+                'p99': round(percentile(latencies, 99), 2) if latencies else None,
+                'max': round(max(latencies), 2) if latencies else None,
+            },
+            'queries_per_request': {
+                'mean': round(sum(queries) / len(queries), 2) if queries else None,
+                'max': max(queries) if queries else None,
+            },
+        }
+
+    def run_tasks(self, tasks, close_connection=True):
+        samples = []
+        try:
+            for user, steps in tasks:
+                driver = self.driver_for(user)
+                for method, url, data in steps:
+                    samples.append(driver.request(method, url, data))
+        finally:
+            if close_connection:
+                connection.close()
+        return samples
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from Quiz.purge import purge_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete soft-deleted exams and subjects with their questions, attempts, answers and "
+        "uploaded files in bounded chunks. Runs forever unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single pass and exit (e.g. from cron).")
+        parser.add_argument('--interval', type=int, default=60, help="Seconds between passes.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Attempts or questions per transaction.")
+
+    def progress(self, exam, counts):
+        done = ', '.join(f"{name} {count}" for name, count in sorted(counts.items()))
+        self.stdout.write(f"  {exam.title} (#{exam.pk}): {done}")
+
+    def handle(self, *args, once, interval, chunk_size, **options):
+        while True:
+            close_old_connections()
+            purged, subjects = purge_pending(chunk_size, self.progress)
+            for exam, counts in purged:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Purged {exam.title} (#{exam.pk}): {counts['attempts']} attempts, "
+                    f"{counts['answers']} answers, {counts['questions']} questions, {counts['files']} files"))
+            if subjects:
+                self.stdout.write(self.style.SUCCESS(f"Purged {subjects} subjects"))
+            if once:
+                break
+            time.sleep(interval)
@@ -0,0 +1,14 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Quiz.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search entries of all questions, exams and subjects."
+
+    def handle(self, *args, **options):
+        began = time.monotonic()
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} entries in {time.monotonic() - began:.2f}s"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from Quiz.archive import restore_attempts
+from Quiz.models import StudentExam
+
+
+class Command(BaseCommand):
+    help = "Move archived attempts back into the Answer table (e.g. to regrade them)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('student_exam_ids', nargs='*', type=int)
+        parser.add_argument('--exam', type=int, help="Restore every archived attempt of this exam.")
+        parser.add_argument('--all', action='store_true', dest='all_attempts', help="Restore every archived attempt.")
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, student_exam_ids, exam, all_attempts, batch_size, **options):
+        queryset = StudentExam.objects.filter(archived_at__isnull=False)
+        if student_exam_ids:
+            queryset = queryset.filter(pk__in=student_exam_ids)
+        elif exam:
+            queryset = queryset.filter(exam_id=exam)
+        elif not all_attempts:
+            raise CommandError("Give attempt ids, --exam or --all")
+
+        attempts, answers = restore_attempts(queryset, batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Restored {answers} answers of {attempts} attempts"))
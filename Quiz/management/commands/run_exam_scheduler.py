@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from Quiz.scheduler import run_due
+
+
+class Command(BaseCommand):
+    help = "Warm caches and send SMS reminders for exams about to start. Runs forever unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run a single pass and exit (e.g. from cron).")
+        parser.add_argument('--interval', type=int, default=60, help="Seconds between passes.")
+        parser.add_argument('--lead-minutes', type=int,
+                            default=getattr(settings, 'EXAM_REMINDER_LEAD_MINUTES', 15),
+                            help="How long before start_date an exam is handled.")
+
+    def handle(self, *args, once, interval, lead_minutes, **options):
+        lead = timezone.timedelta(minutes=lead_minutes)
+        while True:
+            close_old_connections()
+            for exam, records in run_due(lead=lead):
+                sent = sum(1 for r in records if r.status == 'sent')
+                self.stdout.write(f"{exam.title} ({exam.start_date:%Y-%m-%d %H:%M}): {sent}/{len(records)} reminders sent")
+            if once:
+                break
+            time.sleep(interval)
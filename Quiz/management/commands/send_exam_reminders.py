@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Quiz.models import Exam
+from Quiz.scheduler import send_reminder
+
+
+class Command(BaseCommand):
+    help = "Send an SMS reminder for an exam to its enrolled students (or to every student with --all-students)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--all-students', action='store_true',
+                            help="Remind every student with a phone number, not only enrolled ones.")
+        parser.add_argument('--text', help="Custom message text.")
+
+    def handle(self, *args, exam_id, all_students, text, **options):
+        try:
+            exam = Exam.objects.select_related('subject').get(pk=exam_id)
+        except Exam.DoesNotExist:
+            raise CommandError(f"Exam {exam_id} does not exist")
+
+        began = time.monotonic()
+        records = send_reminder(exam, all_students, text)
+        elapsed = time.monotonic() - began
+
+        sent = sum(1 for r in records if r.status == 'sent')
+        self.stdout.write(self.style.SUCCESS(
+            f"{sent}/{len(records)} reminders sent in {elapsed:.2f}s ({len(records) - sent} failed)"
+        ))
@@ -0,0 +1,64 @@
+import random
+import time
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from Quiz import sessions
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE')
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a session workload (every request saves, as with SESSION_SAVE_EVERY_REQUEST) "
+        "against the plain database backend and Quiz.sessions, and report django_session writes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sessions', type=int, default=20)
+        parser.add_argument('--requests', type=int, default=50, help="Requests per session.")
+        parser.add_argument('--write-ratio', type=float, default=0.05,
+                            help="Fraction of requests that actually change session data.")
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'backend':<40} {'requests':>9} {'writes':>7} {'writes/req':>11} {'seconds':>8}")
+        for engine in ('django.contrib.sessions.backends.db', 'Quiz.sessions'):
+            requests, writes, elapsed = self.replay(engine, options)
+            self.stdout.write(f"{engine:<40} {requests:>9} {writes:>7} {writes / requests:>11.3f} {elapsed:>8.2f}")
+        self.stdout.write(f"Quiz.sessions counters in this process: {sessions.stats}")
+
+    def replay(self, engine, options):
+        store_class = import_module(engine).SessionStore
+        rng = random.Random(options['seed'])
+        keys = []
+        for i in range(options['sessions']):
+            store = store_class()
+            store['_auth_user_id'] = str(i)
+            store.create()
+            keys.append(store.session_key)
+
+        total = options['sessions'] * options['requests']
+        began = time.monotonic()
+        with CaptureQueriesContext(connection) as ctx:
+            for n in range(options['requests']):
+                for key in keys:
+                    store = store_class(key)
+                    store.get('_auth_user_id')
+                    if rng.random() < options['write_ratio']:
+                        store['last_page'] = n
+                    store.save()
+            if engine == 'Quiz.sessions':
+                sessions.flush_touches()
+        elapsed = time.monotonic() - began
+
+        writes = sum(
+            1 for q in ctx.captured_queries
+            if q['sql'].lstrip().upper().startswith(WRITE_PREFIXES) and 'django_session' in q['sql']
+        )
+        for key in keys:
+            store_class(key).delete()
+        return total, writes, elapsed
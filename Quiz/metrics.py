@@ -0,0 +1,174 @@
+"""
+In-process request metrics with a Prometheus text exporter.
+
+Each worker keeps fixed-bucket histograms per view and periodically stores a
+snapshot in the shared cache, in one of METRICS_WORKER_SLOTS slots it claims
+with `cache.add`; the /metrics view sums the snapshots of all workers that
+reported within METRICS_WORKER_TTL seconds.
+"""
+import bisect
+import os
+import re
+import socket
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import cache as fragment_cache, ratelimit
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HISTOGRAMS = {
+    'quiz_request_duration_seconds': ('Request latency by view.', LATENCY_BUCKETS),
+    'quiz_request_queries': ('SQL queries per request by view.', QUERY_BUCKETS),
+    'quiz_request_sql_seconds': ('Time spent in SQL per request by view.', LATENCY_BUCKETS),
+}
+
+SLOT_PREFIX = 'quiz:metrics:slot:'
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = Counter()
+_last_flush = 0.0
+_slot = None
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+
+def query_shape(sql):
+    # پارامترها در SQL به‌صورت %s هستند؛ فقط طول لیست‌های IN یکسان‌سازی می‌شود
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def _observe(name, view, value):
+    buckets = HISTOGRAMS[name][1]
+    key = (name, view)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = {'buckets': [0] * (len(buckets) + 1), 'sum': 0.0, 'count': 0}
+    histogram['buckets'][bisect.bisect_left(buckets, value)] += 1
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+def observe_request(view, seconds, queries, sql_seconds, n_plus_one=False):
+    with _lock:
+        _observe('quiz_request_duration_seconds', view, seconds)
+        _observe('quiz_request_queries', view, queries)
+        _observe('quiz_request_sql_seconds', view, sql_seconds)
+        if n_plus_one:
+            _counters[('quiz_n_plus_one_total', view)] += 1
+    maybe_flush()
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def snapshot():
+    with _lock:
+        histograms = [
+            [name, view, list(h['buckets']), h['sum'], h['count']]
+            for (name, view), h in _histograms.items()
+        ]
+        counters = [[name, label, value] for (name, label), value in _counters.items()]
+    for key, value in fragment_cache.fragment_stats().items():
+        fragment, _, outcome = key.rpartition(':')
+        counters.append(['quiz_fragment_cache_total', f"{fragment}:{outcome}", value])
+    for key, value in ratelimit.ratelimit_stats().items():
+        counters.append(['quiz_ratelimit_total', key, value])
+    return {'histograms': histograms, 'counters': counters, 'at': time.time()}
+
+
+def _slot_keys():
+    return [f"{SLOT_PREFIX}{i}" for i in range(getattr(settings, 'METRICS_WORKER_SLOTS', 256))]
+
+
+def flush():
+    """Store this worker's snapshot in its slot, claiming a free one with cache.add if needed."""
+    global _last_flush, _slot
+    _last_flush = time.monotonic()
+    ttl = getattr(settings, 'METRICS_WORKER_TTL', 300)
+    data = {'worker': WORKER_ID, **snapshot()}
+    if _slot is not None:
+        current = cache.get(_slot)
+        if current is not None and current['worker'] == WORKER_ID:
+            cache.set(_slot, data, ttl)
+            return
+        if current is None and cache.add(_slot, data, ttl):
+            return
+        # مهلت جایگاه گذشته و کارگر دیگری آن را گرفته است
+        _slot = None
+    for key in _slot_keys():
+        if cache.add(key, data, ttl):
+            _slot = key
+            return
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 15):
+        flush()
+
+
+def aggregate():
+    snapshots = [data for data in cache.get_many(_slot_keys()).values() if data['worker'] != WORKER_ID]
+    snapshots.append(snapshot())
+
+    histograms, counters = {}, Counter()
+    for data in snapshots:
+        for name, view, buckets, total, count in data['histograms']:
+            merged = histograms.setdefault((name, view), {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], buckets)]
+            merged['sum'] += total
+            merged['count'] += count
+        for name, label, value in data['counters']:
+            counters[(name, label)] += value
+    return histograms, counters
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    histograms, counters = aggregate()
+    lines = []
+    for name, (help_text, bounds) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for (metric, view), h in sorted(histograms.items()):
+            if metric != name:
+                continue
+            label = f'view="{_escape(view)}"'
+            cumulative = 0
+            for bound, count in zip([*bounds, '+Inf'], h['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label}}} {h['sum']}")
+            lines.append(f"{name}_count{{{label}}} {h['count']}")
+
+    lines += ["# HELP quiz_n_plus_one_total Sampled requests that repeated one query shape too often.",
+              "# TYPE quiz_n_plus_one_total counter"]
+    lines += [f'quiz_n_plus_one_total{{view="{_escape(view)}"}} {value}'
+              for (name, view), value in sorted(counters.items()) if name == 'quiz_n_plus_one_total']
+
+    lines += ["# HELP quiz_fragment_cache_total Versioned fragment cache lookups.",
+              "# TYPE quiz_fragment_cache_total counter"]
+    for (name, label), value in sorted(counters.items()):
+        if name == 'quiz_fragment_cache_total':
+            fragment, _, outcome = label.rpartition(':')
+            lines.append(f'quiz_fragment_cache_total{{fragment="{_escape(fragment)}",result="{outcome}"}} {value}')
+
+    lines += ["# HELP quiz_ratelimit_total Throttled endpoint requests by scope and outcome.",
+              "# TYPE quiz_ratelimit_total counter"]
+    for (name, label), value in sorted(counters.items()):
+        if name == 'quiz_ratelimit_total':
+            scope, _, outcome = label.rpartition(':')
+            lines.append(f'quiz_ratelimit_total{{scope="{_escape(scope)}",result="{outcome}"}} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,123 @@
+import logging
+import random
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import db_routers, metrics
+from .log import request_context
+
+logger = logging.getLogger('quiz')
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Keep a client on the primary database for REPLICA_STICKY_SECONDS after it
+    writes, so it always reads its own writes even if the replica lags.
+    """
+    cookie_name = 'primary_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned = float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            pinned = False
+
+        tokens = db_routers.begin_request(pinned)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = db_routers.end_request(tokens)
+
+        if wrote:
+            seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+            response.set_cookie(
+                self.cookie_name, str(time.time() + seconds),
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class RequestLogContextMiddleware:
+    """
+    Expose the request id, user id and view name to log records through
+    Quiz.log.request_context. The id comes from X-Request-ID when a proxy
+    sets it and is echoed back in the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        token = request_context.set({'request_id': request_id})
+        try:
+            response = self.get_response(request)
+        finally:
+            request_context.reset(token)
+        response.setdefault('X-Request-ID', request_id)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        user = getattr(request, 'user', None)
+        request_context.set({
+            **request_context.get(),
+            'user_id': user.pk if user is not None and user.is_authenticated else None,
+            'view_name': request.resolver_match.view_name if request.resolver_match else view_func.__name__,
+        })
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            self.shapes[metrics.query_shape(sql)] += 1
+
+
+class PerformanceMiddleware:
+    """
+    For a METRICS_SAMPLE_RATE fraction of requests, record latency, query
+    count and SQL time per view in Quiz.metrics, and log a warning when one
+    query shape runs more than METRICS_N_PLUS_ONE_THRESHOLD times.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= getattr(settings, 'METRICS_SAMPLE_RATE', 0.1):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        threshold = getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', 10)
+        shape, repeats = recorder.shapes.most_common(1)[0] if recorder.shapes else ('', 0)
+        if repeats > threshold:
+            logger.warning("Possible N+1 in %s: %d x %s", view, repeats, shape)
+
+        metrics.observe_request(view, elapsed, recorder.count, recorder.seconds, n_plus_one=repeats > threshold)
+        return response
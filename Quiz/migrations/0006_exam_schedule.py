@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0005_smsmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['start_date'], name='Quiz_exam_start_d_f8575c_idx'),
+        ),
+    ]
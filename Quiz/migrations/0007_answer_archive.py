@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0006_exam_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAttempt',
+            fields=[
+                ('student_exam', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='Quiz.studentexam')),
+                ('payload', models.BinaryField()),
+                ('answer_count', models.PositiveIntegerField(default=0)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='studentexam',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
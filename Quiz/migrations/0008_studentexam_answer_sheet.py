@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:33
+
+import Quiz.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0007_answer_archive'),
+    ]
+
+    operations = [
+        # تلاش‌های موجود پاسخ‌هایشان در Answer است؛ پیش‌فرض فقط برای ردیف‌های جدید اعمال می‌شود
+        migrations.AddField(
+            model_name='studentexam',
+            name='answer_sheet',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='studentexam',
+            name='answer_sheet',
+            field=models.JSONField(blank=True, default=Quiz.models.new_answer_sheet, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0008_studentexam_answer_sheet'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
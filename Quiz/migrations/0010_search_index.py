@@ -0,0 +1,96 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:51
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# نسخه‌ی ثابت Quiz.search.normalize در زمان نوشتن این مهاجرت؛ تغییرات بعدی آن را عوض نمی‌کند
+TRANSLATION = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه', 'أ': 'ا', 'إ': 'ا', 'آ': 'ا',
+    **{digit: str(n) for n, digit in enumerate('۰۱۲۳۴۵۶۷۸۹')},
+    **{digit: str(n) for n, digit in enumerate('٠١٢٣٤٥٦٧٨٩')},
+    '\u200c': None, '\u0640': None,
+})
+DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+WORD = re.compile(r'\w+')
+
+
+def normalize(*parts):
+    text = ' '.join(part for part in parts if part)
+    return ' '.join(WORD.findall(DIACRITICS.sub('', text.translate(TRANSLATION)).casefold()))
+
+SQLITE_INDEX = [
+    "CREATE VIRTUAL TABLE quiz_search_fts USING fts5(body, content='Quiz_searchentry', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER quiz_search_ai AFTER INSERT ON Quiz_searchentry BEGIN "
+    "INSERT INTO quiz_search_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER quiz_search_ad AFTER DELETE ON Quiz_searchentry BEGIN "
+    "INSERT INTO quiz_search_fts(quiz_search_fts, rowid, body) VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER quiz_search_au AFTER UPDATE ON Quiz_searchentry BEGIN "
+    "INSERT INTO quiz_search_fts(quiz_search_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+    "INSERT INTO quiz_search_fts(rowid, body) VALUES (new.id, new.body); END",
+]
+# متن پیش‌تر در پایتون یکسان‌سازی شده؛ پیکربندی simple فقط جدا و کوچک می‌کند
+POSTGRESQL_INDEX = [
+    'ALTER TABLE "Quiz_searchentry" ADD COLUMN document tsvector '
+    "GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED",
+    'CREATE INDEX quiz_search_document ON "Quiz_searchentry" USING GIN (document)',
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    statements = {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRESQL_INDEX}.get(schema_editor.connection.vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS quiz_search_fts")
+
+
+def backfill(apps, schema_editor):
+    SearchEntry = apps.get_model('Quiz', 'SearchEntry')
+    entries = [
+        SearchEntry(kind='subject', object_id=s.pk, title=s.name[:255], body=normalize(s.name, s.description))
+        for s in apps.get_model('Quiz', 'Subject').objects.filter(deleted_at__isnull=True)
+    ]
+    entries += [
+        SearchEntry(kind='exam', object_id=e.pk, exam_id=e.pk, title=e.title[:255], body=normalize(e.title, e.description))
+        for e in apps.get_model('Quiz', 'Exam').objects.filter(deleted_at__isnull=True)
+    ]
+    questions = apps.get_model('Quiz', 'Question').objects.filter(exam__deleted_at__isnull=True)
+    for q in questions.iterator(chunk_size=2000):
+        entries.append(SearchEntry(kind='question', object_id=q.pk, exam_id=q.exam_id, title=q.text[:255],
+                                   body=normalize(q.text, q.model_answer)))
+        if len(entries) >= 2000:
+            SearchEntry.objects.bulk_create(entries)
+            entries = []
+    SearchEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0009_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('question', 'Question'), ('exam', 'Exam'), ('subject', 'Subject')], max_length=10)),
+                ('object_id', models.PositiveIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('exam', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='Quiz.exam')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_entry')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
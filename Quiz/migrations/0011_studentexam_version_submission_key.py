@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentexam',
+            name='submission_key',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='studentexam',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def drop_duplicate_attempts(apps, schema_editor):
+    # get_or_create در enroll_exam بدون قید یکتا گاهی دو تلاش می‌ساخت؛
+    # تلاش تمام‌شده و در غیر این صورت قدیمی‌ترین نگه داشته می‌شود
+    StudentExam = apps.get_model('Quiz', 'StudentExam')
+    duplicated = (StudentExam.objects.values('student_id', 'exam_id')
+                  .annotate(n=models.Count('pk')).filter(n__gt=1))
+    for pair in duplicated.iterator():
+        attempts = list(StudentExam.objects.filter(student_id=pair['student_id'], exam_id=pair['exam_id'])
+                        .order_by('-is_finished', 'pk').values_list('pk', flat=True))
+        StudentExam.objects.filter(pk__in=attempts[1:]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0011_studentexam_version_submission_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Roster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('exams', models.ManyToManyField(blank=True, related_name='rosters', to='Quiz.exam')),
+                ('students', models.ManyToManyField(blank=True, limit_choices_to={'user_type': 'student'}, related_name='roster_memberships', to=settings.AUTH_USER_MODEL)),
+                ('teacher', models.ForeignKey(limit_choices_to={'user_type': 'teacher'}, on_delete=django.db.models.deletion.CASCADE, related_name='rosters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(drop_duplicate_attempts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='studentexam',
+            constraint=models.UniqueConstraint(fields=('student', 'exam'), name='unique_attempt_per_student'),
+        ),
+    ]
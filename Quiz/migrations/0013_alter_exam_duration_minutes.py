@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:05
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0012_roster_unique_attempt'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exam',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(validators=[django.core.validators.MaxValueValidator(1440)]),
+        ),
+    ]
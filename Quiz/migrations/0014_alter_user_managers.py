@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:40
+
+import Quiz.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0013_alter_exam_duration_minutes'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', Quiz.models.QuizUserManager()),
+                ('teachers', Quiz.models.TeacherManager()),
+                ('students', Quiz.models.StudentManager()),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+# مقدار Quiz.models.MAX_EXAM_DURATION_MINUTES در زمان نوشتن این مهاجرت
+MAX_EXAM_DURATION_MINUTES = 24 * 60
+
+
+def clamp_durations(apps, schema_editor):
+    # آزمون‌های طولانی‌تر پیش از این از open() و live() پنهان می‌شدند
+    Exam = apps.get_model('Quiz', 'Exam')
+    Exam._base_manager.filter(duration_minutes__gt=MAX_EXAM_DURATION_MINUTES).update(
+        duration_minutes=MAX_EXAM_DURATION_MINUTES)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0014_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.RunPython(clamp_durations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Quiz', '0015_clamp_exam_duration'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='exam',
+            constraint=models.CheckConstraint(condition=models.Q(('duration_minutes__lte', 1440)), name='exam_duration_within_cap'),
+        ),
+    ]
@@ -1,16 +1,36 @@
+import json
 import random
+import zlib
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, UserManager
-from django.db import models
+from django.core.validators import MaxValueValidator
+from django.db import models, transaction
 from django.utils import timezone
 
 
-class TeacherManager(UserManager):
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Bulk updates send no post_save, so the affected users' cached rows (Quiz.backends) are dropped here."""
+        from .backends import invalidate_users
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        invalidate_users(user_ids)
+        return rows
+
+    update.alters_data = True
+
+
+class QuizUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class TeacherManager(QuizUserManager):
     def get_queryset(self):
         return super().get_queryset().filter(user_type='teacher')
 
 
-class StudentManager(UserManager):
+class StudentManager(QuizUserManager):
     def get_queryset(self):
         return super().get_queryset().filter(user_type='student')
 
@@ -23,21 +43,104 @@ class User(AbstractUser):
     user_type = models.CharField(max_length=10, choices=USER_TYPE_CHOICES)
     phone_number = models.CharField(max_length=15, blank=True, null=True, unique=True)
 
-    objects = UserManager()
+    objects = QuizUserManager()
     teachers = TeacherManager()
     students = StudentManager()
 
     def __str__(self):
         return f"{self.username} ({self.user_type})"
 
+    def get_session_auth_hash(self):
+        # کاربری که از کش ساخته شده (Quiz.backends) فیلد رمز را بارگذاری نکرده است
+        if hasattr(self, '_session_auth_hash') and 'password' in self.get_deferred_fields():
+            return self._session_auth_hash
+        return super().get_session_auth_hash()
+
+
+class LiveManager(models.Manager):
+    """Hides soft-deleted rows; `all_objects` still sees them until Quiz.purge removes them."""
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
 
 class Subject(models.Model):
     name = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.name
 
+    def soft_delete(self):
+        """Hide the subject and all its exams now; their rows are purged in the background."""
+        from . import search
+        from .cache import bump_version, exam_scope
+        now = timezone.now()
+        exams = Exam.objects.filter(subject=self)
+        exam_ids = list(exams.values_list('pk', flat=True))
+        exams.update(deleted_at=now)
+        self.deleted_at = now
+        self.save(update_fields=['deleted_at'])
+        # ورودی‌های آزمون‌ها و سوال‌ها با deleted_at آزمون پنهان می‌شوند؛ ورودی خود درس حذف می‌شود
+        search.unindex('subject', self.pk)
+        bump_version('exams', *(exam_scope(pk) for pk in exam_ids))
+
+
+class AddMinutes(models.Func):
+    """`datetime + minutes` computed by the database (PostgreSQL by default)."""
+    template = '(%(expressions)s)'
+    arg_joiner = " + INTERVAL '1 minute' * "
+    output_field = models.DateTimeField()
+
+    def as_sqlite(self, compiler, connection, **extra):
+        # SQLite مدت‌زمان را به میکروثانیه نگه می‌دارد
+        return self.as_sql(compiler, connection, template="django_format_dtdelta('+', %(expressions)s * 60000000)",
+                           arg_joiner=', ', **extra)
+
+    def as_mysql(self, compiler, connection, **extra):
+        return self.as_sql(compiler, connection, template='DATE_ADD(%(expressions)s MINUTE)',
+                           arg_joiner=', INTERVAL ', **extra)
+
+
+MAX_EXAM_DURATION_MINUTES = 24 * 60
+
+
+def earliest_open_start(now):
+    # ends_at محاسبه‌ای است و نمایه ندارد؛ این کران روی start_date از نمایه‌ی آن استفاده می‌کند
+    return now - timezone.timedelta(minutes=MAX_EXAM_DURATION_MINUTES)
+
+
+class ExamQuerySet(models.QuerySet):
+    def with_schedule(self, now=None):
+        """Annotate `ends_at` and `status` ('upcoming', 'live' or 'closed') in SQL."""
+        now = now or timezone.now()
+        return self.annotate(ends_at=AddMinutes('start_date', 'duration_minutes')).annotate(status=models.Case(
+            models.When(start_date__gt=now, then=models.Value('upcoming')),
+            models.When(ends_at__gt=now, then=models.Value('live')),
+            default=models.Value('closed'),
+            output_field=models.CharField(),
+        ))
+
+    def upcoming(self, now=None):
+        now = now or timezone.now()
+        return self.with_schedule(now).filter(start_date__gt=now)
+
+    def live(self, now=None):
+        now = now or timezone.now()
+        return self.with_schedule(now).filter(start_date__gt=earliest_open_start(now), start_date__lte=now,
+                                              ends_at__gt=now)
+
+    def open(self, now=None):
+        # آزمون‌هایی که هنوز تمام نشده‌اند (آینده یا در حال برگزاری)
+        now = now or timezone.now()
+        return self.with_schedule(now).filter(start_date__gt=earliest_open_start(now), ends_at__gt=now)
+
+    def starting_between(self, start, end):
+        return self.with_schedule(start).filter(start_date__gt=start, start_date__lte=end)
+
 
 class Exam(models.Model):
     teacher = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'user_type': 'teacher'})
@@ -45,9 +148,21 @@ class Exam(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     start_date = models.DateTimeField()
-    duration_minutes = models.PositiveIntegerField()
+    duration_minutes = models.PositiveIntegerField(validators=[MaxValueValidator(MAX_EXAM_DURATION_MINUTES)])
     total_score = models.PositiveIntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
+    reminder_sent_at = models.DateTimeField(blank=True, null=True)
+    deleted_at = models.DateTimeField(blank=True, null=True)
+
+    objects = LiveManager.from_queryset(ExamQuerySet)()
+    all_objects = ExamQuerySet.as_manager()
+
+    class Meta:
+        indexes = [models.Index(fields=['start_date'])]
+        # open() و live() با earliest_open_start فقط آزمون‌های تا این طول را می‌بینند؛
+        # محدودیت در دیتابیس است تا ادمین، bulk_create و کپی آزمون هم از آن رد نشوند
+        constraints = [models.CheckConstraint(condition=models.Q(duration_minutes__lte=MAX_EXAM_DURATION_MINUTES),
+                                              name='exam_duration_within_cap')]
 
     def __str__(self):
         return f"{self.title} - {self.subject.name}"
@@ -56,6 +171,15 @@ class Exam(models.Model):
     def end_time(self):
         return self.start_date + timezone.timedelta(minutes=self.duration_minutes)
 
+    @property
+    def cache_scope(self):
+        from .cache import exam_scope
+        return exam_scope(self.pk)
+
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        self.save(update_fields=['deleted_at'])
+
 
 class Question(models.Model):
     QUESTION_TYPES = (
@@ -84,6 +208,76 @@ class Choice(models.Model):
         return f"Choice for Q{self.question.id}"
 
 
+class Roster(models.Model):
+    """A class or section; assigning it to an exam creates its students' attempts ahead of time."""
+    teacher = models.ForeignKey(User, on_delete=models.CASCADE, related_name='rosters',
+                                limit_choices_to={'user_type': 'teacher'})
+    name = models.CharField(max_length=100)
+    students = models.ManyToManyField(User, blank=True, related_name='roster_memberships',
+                                      limit_choices_to={'user_type': 'student'})
+    exams = models.ManyToManyField(Exam, blank=True, related_name='rosters')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+    def add_students(self, students):
+        """Add members and create their attempts for the roster's exams that are still open."""
+        self.students.add(*students)
+        for exam in self.exams.open():
+            create_attempts(exam, [s.pk for s in students])
+
+
+def create_attempts(exam, student_ids, batch_size=1000):
+    """Bulk-create unstarted attempts; students that already have one are skipped by the unique constraint."""
+    return StudentExam.objects.bulk_create(
+        [StudentExam(student_id=pk, exam=exam) for pk in student_ids],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+
+
+def assign_rosters(exam, rosters):
+    """Link `rosters` to `exam` and create an attempt for each of their students."""
+    rosters = list(rosters)
+    if not rosters:
+        return
+    exam.rosters.add(*rosters)
+    student_ids = User.students.filter(roster_memberships__in=rosters).values_list('pk', flat=True).distinct()
+    create_attempts(exam, student_ids)
+
+
+class StudentExamQuerySet(models.QuerySet):
+    def visible(self):
+        # تلاش‌های آزمون حذف‌شده تا پاک‌سازی نهایی در جدول می‌مانند
+        return self.filter(exam__deleted_at__isnull=True)
+
+    def with_grading_status(self):
+        pending = Answer.objects.filter(
+            student_exam=models.OuterRef('pk'),
+            question__question_type__in=['short', 'long', 'file'],
+            evaluated=False,
+        )
+        return self.annotate(has_pending_answers=models.Case(
+            models.When(models.Q(models.Exists(pending)) | models.Q(answer_sheet__pending=True), then=True),
+            default=False,
+            output_field=models.BooleanField(),
+        ))
+
+
+ANSWER_SHEET_VERSION = 1
+
+
+def new_answer_sheet():
+    """
+    With ANSWER_STORAGE = 'document', new attempts keep their answers in
+    StudentExam.answer_sheet: {'v': 1, 'pending': bool, 'answers': {'<question id>':
+    {'text', 'choice', 'file', 'marks', 'evaluated'}}} instead of Answer rows.
+    """
+    if getattr(settings, 'ANSWER_STORAGE', 'rows') == 'document':
+        return {'v': ANSWER_SHEET_VERSION, 'pending': False, 'answers': {}}
+    return None
+
+
 class StudentExam(models.Model):
     student = models.ForeignKey(
         'User',
@@ -96,10 +290,31 @@ class StudentExam(models.Model):
     finished_at = models.DateTimeField(null=True, blank=True)
     score = models.FloatField(default=0)
     is_finished = models.BooleanField(default=False)
+    # پاسخ‌های تلاش‌های بایگانی‌شده در ArchivedAttempt نگه داشته می‌شوند
+    archived_at = models.DateTimeField(null=True, blank=True)
+    answer_sheet = models.JSONField(null=True, blank=True, default=new_answer_sheet)
+    # هر نوشتن روی تلاش (ذخیره‌ی خودکار، ارسال) نسخه را با UPDATE شرطی یکی بالا می‌برد
+    version = models.PositiveIntegerField(default=0)
+    submission_key = models.CharField(max_length=64, blank=True, null=True)
+
+    objects = StudentExamQuerySet.as_manager()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['student', 'exam'], name='unique_attempt_per_student')]
 
     def __str__(self):
         return f"{self.student.username} - {self.exam.title}"
 
+    def start(self, now=None):
+        """Set `started_at` once with a conditional UPDATE; returns True for the request that did it."""
+        now = now or timezone.now()
+        started = StudentExam.objects.filter(pk=self.pk, started_at__isnull=True).update(started_at=now)
+        if started:
+            self.started_at = now
+        else:
+            self.started_at = StudentExam.objects.filter(pk=self.pk).values_list('started_at', flat=True).first()
+        return bool(started)
+
     def time_remaining(self):
         if self.started_at:
             elapsed = timezone.now() - self.started_at
@@ -108,19 +323,197 @@ class StudentExam(models.Model):
             return max(remaining, timezone.timedelta(seconds=0))
         return timezone.timedelta(minutes=self.exam.duration_minutes)
 
+    @property
+    def uses_answer_sheet(self):
+        return self.answer_sheet is not None
+
+    def get_answers(self):
+        """Answers with their questions, from Answer rows, the archive or the answer sheet."""
+        if self.uses_answer_sheet:
+            sheet = self.answer_sheet['answers']
+            return [
+                Answer(student_exam=self, question=question, answer_text=entry.get('text'),
+                       selected_choice_id=entry.get('choice'), uploaded_file=entry.get('file'),
+                       marks_obtained=entry.get('marks', 0), evaluated=entry.get('evaluated', False))
+                for question in self.exam.questions.order_by('pk')
+                for entry in [sheet.get(str(question.id))] if entry is not None
+            ]
+        if self.archived_at is not None:
+            return self.archive.load_answers()
+        return list(self.answers.select_related('question'))
+
+    def claim(self):
+        """
+        Compare-and-set on `version`: bump it only if the attempt is unfinished
+        and nobody wrote to it since this instance read it. On a conflict the
+        instance is refreshed and the claim retried; returns False once the
+        attempt is finished. Call inside a transaction, before writing answers.
+        """
+        while True:
+            claimed = StudentExam.objects.filter(pk=self.pk, version=self.version, is_finished=False).update(
+                version=models.F('version') + 1)
+            if claimed:
+                self.version += 1
+                return True
+            current = StudentExam.objects.filter(pk=self.pk).values(
+                'version', 'is_finished', 'answer_sheet', 'submission_key').first()
+            if current is None:
+                return False
+            self.is_finished, self.submission_key = current['is_finished'], current['submission_key']
+            if self.is_finished:
+                return False
+            self.version, self.answer_sheet = current['version'], current['answer_sheet']
+
+    def save_answers(self, data, files=None):
+        """
+        Store the `question_<id>` fields of a posted exam form (all of them on
+        submit, usually one on autosave) with one read and one bulk write each,
+        or a single-row update in answer-sheet mode. Uploads in `files` are
+        written to storage first and recorded like any other answer.
+        """
+        files = files or {}
+        ids = {int(name[9:]) for name in [*data, *files] if name.startswith('question_') and name[9:].isdigit()}
+        questions = {q.id: q for q in self.exam.questions.filter(id__in=ids)}
+        if not questions:
+            return 0
+        choices = {
+            str(pk): question_id for pk, question_id in Choice.objects.filter(
+                question_id__in=[q.id for q in questions.values() if q.question_type == 'mcq'],
+            ).values_list('id', 'question_id')
+        }
+        values = {}
+        field = Answer._meta.get_field('uploaded_file')
+        for question in questions.values():
+            if question.question_type == 'file':
+                upload = files.get(f"question_{question.id}")
+                if upload:
+                    values[question.id] = ('file', field.storage.save(field.generate_filename(None, upload.name), upload))
+                continue
+            value = (data.get(f"question_{question.id}") or '').strip()
+            if question.question_type == 'mcq':
+                values[question.id] = ('choice', int(value) if choices.get(value) == question.id else None)
+            else:
+                values[question.id] = ('text', value)
+
+        if self.uses_answer_sheet:
+            sheet = self.answer_sheet['answers']
+            for question_id, (key, value) in values.items():
+                sheet.setdefault(str(question_id), {})[key] = value
+            StudentExam.objects.filter(pk=self.pk).update(answer_sheet=self.answer_sheet)
+            return len(values)
+
+        existing = {a.question_id: a for a in self.answers.filter(question_id__in=questions)}
+        created, updated = [], []
+        for question_id, (key, value) in values.items():
+            answer = existing.get(question_id)
+            if answer is None:
+                answer = Answer(student_exam=self, question=questions[question_id])
+                created.append(answer)
+            else:
+                updated.append(answer)
+            if key == 'choice':
+                answer.selected_choice_id = value
+            elif key == 'file':
+                answer.uploaded_file = value
+            else:
+                answer.answer_text = value
+        Answer.objects.bulk_create(created)
+        Answer.objects.bulk_update(updated, ['selected_choice', 'answer_text', 'uploaded_file'])
+        return len(values)
+
+    def submit(self, data=None, files=None, key=None):
+        """
+        Store the posted answers, grade multiple-choice answers, compute the
+        score and finish the attempt, all in one transaction. Returns False
+        without doing anything when the attempt was already submitted, e.g. a
+        double click, the timer's auto-submit or a second tab; `key` is the
+        form's idempotency key, kept to tell a replay from another submission.
+        """
+        with transaction.atomic():
+            if not self.claim():
+                return False
+            if data or files:
+                self.save_answers(data or {}, files)
+            if self.uses_answer_sheet:
+                self._grade_answer_sheet()
+            else:
+                existing = set(self.answers.values_list('question_id', flat=True))
+                Answer.objects.bulk_create([
+                    Answer(student_exam=self, question_id=pk)
+                    for pk in self.exam.questions.values_list('pk', flat=True) if pk not in existing
+                ])
+                self.auto_grade_mcq_answers()
+                self.calculate_final_score()
+            self.is_finished = True
+            self.finished_at = timezone.now()
+            self.submission_key = key
+            self.save(update_fields=['answer_sheet', 'score', 'is_finished', 'finished_at', 'submission_key'])
+        return True
+
+    def _grade_answer_sheet(self):
+        correct = set(Choice.objects.filter(question__exam_id=self.exam_id, is_correct=True).values_list('id', flat=True))
+        sheet = self.answer_sheet['answers']
+        for question in self.exam.questions.all():
+            entry = sheet.setdefault(str(question.id), {})
+            if question.question_type == 'mcq':
+                entry['marks'] = question.marks if entry.get('choice') in correct else 0
+                entry['evaluated'] = True
+        self.answer_sheet['pending'] = not all(entry.get('evaluated') for entry in sheet.values())
+        self.score = sum(entry.get('marks', 0) for entry in sheet.values() if entry.get('evaluated'))
+
     def mark_as_finished(self):
         self.is_finished = True
         self.finished_at = timezone.now()
         self.save()
 
+    def grade_answers(self, data):
+        """
+        Store the `marks_<question id>` fields of the grading form for the
+        non-multiple-choice questions, clamped to each question's marks, mark
+        them evaluated and recompute the score.
+        """
+        questions = self.exam.questions.exclude(question_type='mcq').in_bulk()
+        marks = {}
+        for question_id, question in questions.items():
+            try:
+                value = float(data[f"marks_{question_id}"])
+            except (KeyError, ValueError):
+                continue
+            marks[question_id] = min(max(value, 0), question.marks)
+
+        if self.uses_answer_sheet:
+            sheet = self.answer_sheet['answers']
+            for question_id, value in marks.items():
+                sheet.setdefault(str(question_id), {}).update(marks=value, evaluated=True)
+            self.answer_sheet['pending'] = not all(entry.get('evaluated') for entry in sheet.values())
+            self.save(update_fields=['answer_sheet'])
+        else:
+            answers = list(self.answers.filter(question_id__in=marks))
+            for answer in answers:
+                answer.marks_obtained = marks[answer.question_id]
+                answer.evaluated = True
+            Answer.objects.bulk_update(answers, ['marks_obtained', 'evaluated'])
+        self.calculate_final_score()
+        return len(marks)
+
     @property
     def needs_grading(self):
+        if hasattr(self, 'has_pending_answers'):
+            return self.has_pending_answers
+        if self.uses_answer_sheet:
+            return self.answer_sheet['pending']
         return self.answers.filter(
             question__question_type__in=['short', 'long', 'file'],
             evaluated=False
         ).exists()
 
     def calculate_final_score(self):
+        if self.uses_answer_sheet:
+            sheet = self.answer_sheet['answers']
+            self.score = sum(entry.get('marks', 0) for entry in sheet.values() if entry.get('evaluated'))
+            self.save(update_fields=['score'])
+            return
+
         auto_score = self.answers.filter(
             question__question_type='mcq',
             evaluated=True
@@ -135,7 +528,8 @@ class StudentExam(models.Model):
         self.save(update_fields=['score'])
 
     def auto_grade_mcq_answers(self):
-        mcq_answers = self.answers.filter(question__question_type='mcq', evaluated=False)
+        mcq_answers = self.answers.filter(question__question_type='mcq', evaluated=False).select_related(
+            'question', 'selected_choice')
         for answer in mcq_answers:
             answer.auto_grade()
 
@@ -164,6 +558,37 @@ class Answer(models.Model):
         self.save()
 
 
+class ArchivedAttempt(models.Model):
+    """
+    All answers of one fully graded attempt as a zlib-compressed JSON list,
+    moved out of Answer by `manage.py archive_answers`.
+    """
+    FIELDS = ('id', 'question_id', 'answer_text', 'selected_choice_id', 'uploaded_file', 'marks_obtained', 'evaluated')
+
+    student_exam = models.OneToOneField(StudentExam, on_delete=models.CASCADE, primary_key=True, related_name='archive')
+    payload = models.BinaryField()
+    answer_count = models.PositiveIntegerField(default=0)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def pack(rows):
+        return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode(), 9)
+
+    def rows(self):
+        return [dict(zip(self.FIELDS, row)) for row in json.loads(zlib.decompress(self.payload))]
+
+    def load_answers(self):
+        rows = self.rows()
+        questions = Question.objects.in_bulk([row['question_id'] for row in rows])
+        answers = []
+        for row in rows:
+            if row['question_id'] in questions:
+                answer = Answer(student_exam=self.student_exam, **row)
+                answer.question = questions[row['question_id']]
+                answers.append(answer)
+        return answers
+
+
 class OTP(models.Model):
     phone = models.CharField(max_length=15)
     code = models.CharField(max_length=6)
@@ -178,3 +603,48 @@ class OTP(models.Model):
 
     def __str__(self):
         return f"{self.phone} - {self.code}"
+
+
+class SmsMessage(models.Model):
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+    phone = models.CharField(max_length=15)
+    body = models.TextField()
+    backend = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    provider_id = models.CharField(max_length=100, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.phone} - {self.status}"
+
+
+class SearchEntry(models.Model):
+    """
+    One row per searchable Question, Exam or Subject, kept current by
+    Quiz.signals. `body` holds the normalized text (Quiz.search.normalize);
+    the full-text index over it (tsvector + GIN on PostgreSQL, FTS5 on
+    SQLite) lives outside the ORM and is created in migration 0010.
+    """
+    KIND_CHOICES = (
+        ('question', 'Question'),
+        ('exam', 'Exam'),
+        ('subject', 'Subject'),
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    # آزمون خود سوال یا خود آزمون؛ برای درس‌ها خالی است
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, null=True, blank=True)
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_search_entry')]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
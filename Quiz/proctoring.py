@@ -0,0 +1,70 @@
+"""
+Live exam activity kept in the shared cache, for the proctoring page.
+
+Enrollment, autosave and submission call record(); nothing here touches the
+database. Each attempt gets a slot number from an atomic cache.incr() so the
+roster can be read back without a shared list that concurrent writers would
+race on. tick() builds one aggregated snapshot per exam and caches it for
+PROCTOR_TICK_SECONDS, so every teacher watching the same exam, in any worker,
+reads the same snapshot instead of recomputing it.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+PREFIX = 'quiz:proctor'
+
+
+def _ttl():
+    return getattr(settings, 'PROCTOR_TTL', 6 * 3600)
+
+
+def _attempt_key(exam_id, student_exam_id):
+    return f"{PREFIX}:{exam_id}:attempt:{student_exam_id}"
+
+
+def record(student_exam, state, username=None):
+    """state is 'started', 'active' or 'submitted'."""
+    key = _attempt_key(student_exam.exam_id, student_exam.pk)
+    entry = cache.get(key)
+    if entry is None:
+        seq_key = f"{PREFIX}:{student_exam.exam_id}:seq"
+        cache.add(seq_key, 0, _ttl())
+        slot = cache.incr(seq_key)
+        cache.set(f"{PREFIX}:{student_exam.exam_id}:slot:{slot}", student_exam.pk, _ttl())
+        entry = {'student': username or str(student_exam.student_id), 'state': state}
+    elif entry['state'] != 'submitted':
+        entry['state'] = state
+    entry['last_seen'] = time.time()
+    cache.set(key, entry, _ttl())
+
+
+def build_snapshot(exam_id):
+    count = cache.get(f"{PREFIX}:{exam_id}:seq") or 0
+    slots = cache.get_many([f"{PREFIX}:{exam_id}:slot:{n}" for n in range(1, count + 1)])
+    entries = cache.get_many([_attempt_key(exam_id, pk) for pk in slots.values()])
+
+    now = time.time()
+    idle_after = getattr(settings, 'PROCTOR_IDLE_SECONDS', 120)
+    students = []
+    counts = {'started': 0, 'submitted': 0, 'idle': 0}
+    for entry in entries.values():
+        state = entry['state']
+        if state != 'submitted' and now - entry['last_seen'] > idle_after:
+            state = 'idle'
+        counts['started'] += 1
+        if state in counts:
+            counts[state] += 1
+        students.append({'student': entry['student'], 'state': state, 'last_seen': entry['last_seen']})
+    students.sort(key=lambda s: s['last_seen'], reverse=True)
+    return {'exam': exam_id, 'at': now, 'counts': counts, 'students': students}
+
+
+def tick(exam_id):
+    key = f"{PREFIX}:{exam_id}:tick"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(exam_id)
+        cache.set(key, snapshot, getattr(settings, 'PROCTOR_TICK_SECONDS', 2))
+    return snapshot
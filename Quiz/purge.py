@@ -0,0 +1,103 @@
+"""
+Remove soft-deleted exams and subjects for good.
+
+delete_exam and the admin only set `deleted_at`, which hides the row from the
+default managers at once. purge_pending() then deletes the dependent rows in
+chunks of attempts and questions, each chunk one transaction of plain
+`DELETE ... WHERE id IN (...)` statements, so no request loads a whole exam
+into the deletion collector and no table is locked for long. Uploaded files
+are removed after their chunk commits, unless another answer still points at
+the same name.
+"""
+import logging
+from collections import Counter
+
+from django.db import transaction
+
+from .models import Answer, ArchivedAttempt, Choice, Exam, Question, Roster, SearchEntry, StudentExam, Subject
+
+logger = logging.getLogger('quiz')
+
+
+def _raw_delete(queryset):
+    # بدون Collector و سیگنال؛ وابسته‌ها پیش از این پاک شده‌اند
+    return queryset._raw_delete(queryset.db)
+
+
+def _chunks(queryset, size):
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:size])
+        if not ids:
+            return
+        yield ids
+
+
+def _attempt_files(ids):
+    files = set(Answer.objects.filter(student_exam_id__in=ids).exclude(uploaded_file='')
+                .exclude(uploaded_file__isnull=True).values_list('uploaded_file', flat=True))
+    for sheet in StudentExam.objects.filter(pk__in=ids, answer_sheet__isnull=False).values_list('answer_sheet', flat=True):
+        files.update(entry['file'] for entry in sheet['answers'].values() if entry.get('file'))
+    for archive in ArchivedAttempt.objects.filter(student_exam_id__in=ids):
+        files.update(row['uploaded_file'] for row in archive.rows() if row['uploaded_file'])
+    return files
+
+
+def remove_orphaned_files(names):
+    """Delete stored files no Answer row refers to any more; returns how many were removed."""
+    names = set(names)
+    if not names:
+        return 0
+    names -= set(Answer.objects.filter(uploaded_file__in=names).values_list('uploaded_file', flat=True))
+    storage = Answer._meta.get_field('uploaded_file').storage
+    removed = 0
+    for name in names:
+        if storage.exists(name):
+            storage.delete(name)
+            removed += 1
+    return removed
+
+
+def purge_exam(exam, chunk_size=500, progress=None):
+    """
+    Delete a soft-deleted exam with its attempts, answers, questions and
+    choices; `progress(exam, counts)` is called after every chunk.
+    """
+    counts = Counter()
+
+    def report():
+        if progress:
+            progress(exam, counts)
+
+    _raw_delete(SearchEntry.objects.filter(exam_id=exam.pk))
+    for ids in _chunks(StudentExam.objects.filter(exam_id=exam.pk), chunk_size):
+        files = _attempt_files(ids)
+        with transaction.atomic():
+            counts['answers'] += _raw_delete(Answer.objects.filter(student_exam_id__in=ids))
+            counts['archives'] += _raw_delete(ArchivedAttempt.objects.filter(student_exam_id__in=ids))
+            counts['attempts'] += _raw_delete(StudentExam.objects.filter(pk__in=ids))
+        counts['files'] += remove_orphaned_files(files)
+        report()
+
+    for ids in _chunks(Question.objects.filter(exam_id=exam.pk), chunk_size):
+        with transaction.atomic():
+            counts['choices'] += _raw_delete(Choice.objects.filter(question_id__in=ids))
+            counts['questions'] += _raw_delete(Question.objects.filter(pk__in=ids))
+        report()
+
+    _raw_delete(Roster.exams.through.objects.filter(exam_id=exam.pk))
+    _raw_delete(Exam.all_objects.filter(pk=exam.pk))
+    logger.info("Purged exam %s: %s", exam.pk, dict(counts))
+    return counts
+
+
+def purge_pending(chunk_size=500, progress=None):
+    """Purge every soft-deleted exam, then soft-deleted subjects left without exams."""
+    purged = []
+    for exam in Exam.all_objects.filter(deleted_at__isnull=False).order_by('deleted_at'):
+        purged.append((exam, purge_exam(exam, chunk_size, progress)))
+    subjects = Subject.all_objects.filter(deleted_at__isnull=False).exclude(
+        pk__in=Exam.all_objects.values('subject_id'))
+    subject_count = _raw_delete(subjects)
+    if subject_count:
+        logger.info("Purged %s deleted subjects", subject_count)
+    return purged, subject_count
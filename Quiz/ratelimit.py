@@ -0,0 +1,189 @@
+"""
+Request throttling for the login, registration and OTP endpoints.
+
+`@ratelimit(scope)` checks every rule listed for the scope in RATELIMITS,
+e.g. ``{'login': {'ip': '30/m', 'post:username': '5/m'}}``, before the view
+runs. A rule keys the request by its client IP (``ip``) or by a posted field
+(``post:<name>``) and allows `count` hits per period (``s``, ``m``, ``h`` or
+``d``, optionally with a multiplier such as ``5/15m``). Rejected requests get a
+plain 429 with Retry-After, without touching the database or hashing a
+password.
+
+RATELIMIT_BACKEND picks where the windows are kept: LocMemBackend counts in
+this process only, CacheBackend in the shared cache so that every worker sees
+the same counts.
+"""
+import functools
+import hashlib
+import math
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+KEY_PREFIX = 'quiz:rl:'
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# شمارنده‌های allowed/blocked هر scope در همین پردازه
+stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(scope, outcome):
+    with _stats_lock:
+        stats[f"{scope}:{outcome}"] += 1
+
+
+def ratelimit_stats():
+    with _stats_lock:
+        return dict(stats)
+
+
+def parse_rate(rate):
+    """'5/m' -> (5, 60), '10/15m' -> (10, 900)."""
+    count, _, period = rate.partition('/')
+    multiplier = period[:-1] or '1'
+    return int(count), int(multiplier) * PERIODS[period[-1]]
+
+
+class LocMemBackend:
+    """Sliding-window log per key, kept in this process."""
+    max_keys = 10000
+
+    def __init__(self):
+        self.windows = {}
+        self.lock = threading.Lock()
+
+    def attempt(self, key, limit, period):
+        """Record a hit and return 0, or the seconds to wait if the key is over its limit."""
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None:
+                if len(self.windows) >= self.max_keys:
+                    self._sweep(now, period)
+                window = self.windows[key] = deque()
+            while window and window[0] <= now - period:
+                window.popleft()
+            if len(window) >= limit:
+                return window[0] + period - now
+            window.append(now)
+            return 0
+
+    def _sweep(self, now, period):
+        # کلیدهایی که در یک بازه‌ی کامل درخواستی نداشته‌اند حذف می‌شوند
+        for key in [k for k, w in self.windows.items() if not w or w[-1] <= now - period]:
+            del self.windows[key]
+
+    def reset(self):
+        with self.lock:
+            self.windows.clear()
+
+
+class CacheBackend:
+    """
+    Sliding-window counter in the shared cache: the current fixed window's
+    count plus the previous window's, weighted by how much of it still
+    overlaps. One get_many per check and, for allowed hits, one add and incr.
+    """
+
+    def attempt(self, key, limit, period):
+        now = time.time()
+        index, offset = divmod(now, period)
+        current, previous = f"{KEY_PREFIX}{key}:{int(index)}", f"{KEY_PREFIX}{key}:{int(index) - 1}"
+        counts = cache.get_many([current, previous])
+        weight = 1 - offset / period
+        if counts.get(previous, 0) * weight + counts.get(current, 0) >= limit:
+            return period - offset
+        cache.add(current, 0, period * 2)
+        try:
+            cache.incr(current)
+        except ValueError:
+            # کلید بین add و incr منقضی شده است
+            cache.set(current, 1, period * 2)
+        return 0
+
+    def reset(self):
+        pass
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    path = getattr(settings, 'RATELIMIT_BACKEND', 'Quiz.ratelimit.CacheBackend')
+    with _backends_lock:
+        backend = _backends.get(path)
+        if backend is None:
+            backend = _backends[path] = import_string(path)()
+        return backend
+
+
+def client_ip(request):
+    """
+    REMOTE_ADDR, or behind a reverse proxy the address it reports: the last
+    entry of RATELIMIT_CLIENT_IP_HEADER (e.g. 'HTTP_X_FORWARDED_FOR'), which
+    the proxy appends and the client can't forge, provided the request really
+    came from one of RATELIMIT_TRUSTED_PROXIES.
+    """
+    remote = request.META.get('REMOTE_ADDR', '')
+    header = getattr(settings, 'RATELIMIT_CLIENT_IP_HEADER', None)
+    if header and remote in getattr(settings, 'RATELIMIT_TRUSTED_PROXIES', ()):
+        forwarded = [part.strip() for part in request.META.get(header, '').split(',') if part.strip()]
+        if forwarded:
+            return forwarded[-1]
+    return remote
+
+
+def request_key(request, source):
+    if source == 'ip':
+        value = client_ip(request)
+    elif source.startswith('post:'):
+        value = request.POST.get(source[5:], '').strip().lower()
+    else:
+        raise ValueError(f"Unknown rate limit key: {source}")
+    if not value:
+        return None
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+def check(request, scope):
+    """Return 0 if the request is within every rule of `scope`, else the seconds until it would be."""
+    backend = get_backend()
+    for source, rate in getattr(settings, 'RATELIMITS', {}).get(scope, {}).items():
+        key = request_key(request, source)
+        if key is None:
+            continue
+        limit, period = parse_rate(rate)
+        wait = backend.attempt(f"{scope}:{source}:{key}", limit, period)
+        if wait:
+            _count(scope, 'blocked')
+            return wait
+    _count(scope, 'allowed')
+    return 0
+
+
+def too_many_requests(wait):
+    response = HttpResponse("تعداد درخواست‌ها بیش از حد مجاز است؛ لطفاً کمی بعد دوباره تلاش کنید.",
+                            status=429, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def ratelimit(scope, methods=('POST',)):
+    """Throttle `methods` requests to the view by the rules of RATELIMITS[scope]."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods and getattr(settings, 'RATELIMIT_ENABLED', True):
+                wait = check(request, scope)
+                if wait:
+                    return too_many_requests(wait)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,56 @@
+"""
+Work done just before an exam starts: warm the caches its first requests hit
+and send the SMS reminder. Due exams are found with Exam.objects.starting_between()
+and claimed through `reminder_sent_at`, so each start time is handled once even
+with several schedulers running; editing start_date clears the claim.
+"""
+import logging
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .backends import warm_users
+from .cache import cached_subjects
+from .models import Exam, User
+from .sms import send_mass_sms
+
+logger = logging.getLogger('quiz')
+
+
+def reminder_phones(exam, all_students=False):
+    students = User.students.exclude(phone_number__isnull=True).exclude(phone_number='')
+    if not all_students:
+        students = students.filter(studentexam__exam=exam)
+    return students.values_list('phone_number', flat=True).distinct()
+
+
+def send_reminder(exam, all_students=False, text=None):
+    start = timezone.localtime(exam.start_date).strftime('%Y/%m/%d %H:%M')
+    text = text or f"یادآوری: آزمون «{exam.title}» ({exam.subject.name}) در {start} شروع می‌شود."
+    return send_mass_sms((phone, text) for phone in reminder_phones(exam, all_students))
+
+
+def prewarm(exam):
+    # کاربران ثبت‌نام‌شده و معلم در لحظه‌ی شروع همزمان وارد می‌شوند
+    warm_users(User.objects.filter(Q(pk=exam.teacher_id) | Q(studentexam__exam=exam)).distinct())
+    cached_subjects()
+
+
+def run_due(now=None, lead=None):
+    """Handle every exam starting within `lead`; returns [(exam, sms records)]."""
+    now = now or timezone.now()
+    if lead is None:
+        lead = timezone.timedelta(minutes=getattr(settings, 'EXAM_REMINDER_LEAD_MINUTES', 15))
+    due = Exam.objects.starting_between(now, now + lead).filter(reminder_sent_at__isnull=True).select_related('subject')
+
+    handled = []
+    for exam in due:
+        claimed = Exam.objects.filter(pk=exam.pk, reminder_sent_at__isnull=True).update(reminder_sent_at=now)
+        if not claimed:
+            continue
+        prewarm(exam)
+        records = send_reminder(exam)
+        logger.info("Exam %s starts at %s: caches warmed, %s reminders queued", exam.pk, exam.start_date, len(records))
+        handled.append((exam, records))
+    return handled
@@ -0,0 +1,108 @@
+"""
+Full-text search over questions, exams and subjects.
+
+Every searchable object has a SearchEntry whose `body` is normalized here
+(Arabic to Persian letters, digits, diacritics, tatweel, ZWNJ, case), so a
+query typed with any keyboard layout matches. Quiz.signals keeps the entries
+current on save and delete. Matching and ranking use the database's index:
+a GIN-indexed tsvector with ts_rank on PostgreSQL, FTS5 with bm25 on SQLite,
+and plain substring filters elsewhere.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Exam, Question, SearchEntry, Subject
+
+TRANSLATION = str.maketrans({
+    'ي': 'ی', 'ى': 'ی', 'ك': 'ک', 'ة': 'ه', 'ۀ': 'ه', 'أ': 'ا', 'إ': 'ا', 'آ': 'ا',
+    **{digit: str(n) for n, digit in enumerate('۰۱۲۳۴۵۶۷۸۹')},
+    **{digit: str(n) for n, digit in enumerate('٠١٢٣٤٥٦٧٨٩')},
+    # نیم‌فاصله و کشیده حذف می‌شوند تا «می‌شود» و «میشود» یکی باشند
+    '\u200c': None, '\u0640': None,
+})
+DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+WORD = re.compile(r'\w+')
+MAX_TERMS = 8
+# ذخیره‌هایی که فقط فیلدهای دیگر را تغییر می‌دهند (مثل deleted_at) نمایه را دست نمی‌زنند
+INDEXED_FIELDS = {'text', 'model_answer', 'title', 'description', 'name', 'exam'}
+
+
+def normalize(*parts):
+    text = ' '.join(part for part in parts if part)
+    return ' '.join(WORD.findall(DIACRITICS.sub('', text.translate(TRANSLATION)).casefold()))
+
+
+def terms(query):
+    return normalize(query).split()[:MAX_TERMS]
+
+
+def _entry(obj):
+    if isinstance(obj, Question):
+        return SearchEntry(kind='question', object_id=obj.pk, exam_id=obj.exam_id, title=obj.text[:255],
+                           body=normalize(obj.text, obj.model_answer))
+    if isinstance(obj, Exam):
+        return SearchEntry(kind='exam', object_id=obj.pk, exam_id=obj.pk, title=obj.title[:255],
+                           body=normalize(obj.title, obj.description))
+    return SearchEntry(kind='subject', object_id=obj.pk, title=obj.name[:255], body=normalize(obj.name, obj.description))
+
+
+def index(objects):
+    """
+    Insert or refresh the entries of `objects` (any mix of questions, exams
+    and subjects) with one upsert per batch; also used after bulk_create,
+    which sends no signals.
+    """
+    SearchEntry.objects.bulk_create(
+        [_entry(obj) for obj in objects], batch_size=500, update_conflicts=True,
+        unique_fields=['kind', 'object_id'], update_fields=['exam', 'title', 'body'],
+    )
+
+
+def unindex(kind, object_id):
+    SearchEntry.objects.filter(kind=kind, object_id=object_id).delete()
+
+
+def rebuild():
+    SearchEntry.objects.all().delete()
+    index(Subject.objects.iterator())
+    index(Exam.objects.iterator())
+    index(Question.objects.filter(exam__deleted_at__isnull=True).iterator(chunk_size=2000))
+    return SearchEntry.objects.count()
+
+
+def _match(entries, words):
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f"{word}:*" for word in words)
+        return entries.alias(hit=RawSQL(
+            '"Quiz_searchentry"."document" @@ to_tsquery(\'simple\', %s)', [tsquery], output_field=BooleanField(),
+        )).filter(hit=True).annotate(rank=RawSQL(
+            'ts_rank("Quiz_searchentry"."document", to_tsquery(\'simple\', %s))', [tsquery], output_field=FloatField(),
+        ))
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{word}"*' for word in words)
+        return entries.filter(id__in=RawSQL(
+            "SELECT rowid FROM quiz_search_fts WHERE quiz_search_fts MATCH %s", [match],
+        )).annotate(rank=RawSQL(
+            # rank همان bm25 است و هرچه منفی‌تر مرتبط‌تر
+            'SELECT -rank FROM quiz_search_fts WHERE quiz_search_fts MATCH %s AND rowid = "Quiz_searchentry"."id"',
+            [match], output_field=FloatField(),
+        ))
+    for word in words:
+        entries = entries.filter(body__contains=word)
+    return entries.annotate(rank=Value(0.0))
+
+
+def search(query, teacher=None, kinds=None, limit=50):
+    """Entries matching every term of `query` by prefix, best first; only `teacher`'s exams when given."""
+    words = terms(query)
+    if not words:
+        return SearchEntry.objects.none()
+    entries = SearchEntry.objects.filter(Q(exam__isnull=True) | Q(exam__deleted_at__isnull=True))
+    if teacher is not None:
+        entries = entries.filter(Q(exam__isnull=True) | Q(exam__teacher=teacher))
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    return _match(entries, words).order_by('-rank', '-pk')[:limit]
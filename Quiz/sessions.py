@@ -0,0 +1,142 @@
+"""
+Cached, database-backed sessions that only write to the database when needed.
+
+Reads are served from the cache exactly like ``cached_db``. ``save()`` compares
+the session data with what was loaded and, when nothing changed, skips the
+database write unless the stored expiry is about to fall behind by more than
+SESSION_WRITE_REFRESH seconds. Those expiry refreshes are queued and flushed
+as a single ``UPDATE`` per batch instead of one write per request.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.utils import timezone
+
+logger = logging.getLogger('quiz')
+
+# شمارنده‌های درون‌پردازه‌ای برای گزارش فرمان session_write_stats
+stats = {'db_writes': 0, 'touches': 0, 'skipped': 0, 'flushes': 0}
+
+_pending_touches = set()
+_pending_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def flush_touches():
+    """Push queued expiry refreshes to the database in one UPDATE."""
+    global _last_flush
+    with _pending_lock:
+        keys = list(_pending_touches)
+        _pending_touches.clear()
+        _last_flush = time.monotonic()
+    if not keys:
+        return 0
+    model = SessionStore.get_model_class()
+    expire_date = timezone.now() + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    try:
+        model.objects.filter(session_key__in=keys).update(expire_date=expire_date)
+    except Exception:
+        logger.exception("Failed to flush %d session expiry touches", len(keys))
+        return 0
+    stats['flushes'] += 1
+    return len(keys)
+
+
+def _queue_touch(session_key):
+    batch_size = getattr(settings, 'SESSION_TOUCH_BATCH_SIZE', 200)
+    interval = getattr(settings, 'SESSION_TOUCH_FLUSH_INTERVAL', 30)
+    with _pending_lock:
+        _pending_touches.add(session_key)
+        due = len(_pending_touches) >= batch_size or time.monotonic() - _last_flush >= interval
+    if due:
+        flush_touches()
+
+
+atexit.register(flush_touches)
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = 'quiz.sessions'
+
+    @property
+    def expiry_cache_key(self):
+        return self.cache_key + ':expiry'
+
+    @staticmethod
+    def _digest(data):
+        return hashlib.md5(
+            json.dumps(data, sort_keys=True, default=str).encode(), usedforsecurity=False
+        ).hexdigest()
+
+    def load(self):
+        try:
+            cached = self._cache.get_many([self.cache_key, self.expiry_cache_key])
+        except Exception:
+            cached = {}
+        data = cached.get(self.cache_key)
+        self._synced_expiry = cached.get(self.expiry_cache_key)
+
+        if data is None:
+            s = self._get_session_from_db()
+            if s:
+                data = self.decode(s.session_data)
+                self._synced_expiry = s.expire_date.timestamp()
+                self._cache.set_many({
+                    self.cache_key: data,
+                    self.expiry_cache_key: self._synced_expiry,
+                }, self.get_expiry_age(expiry=s.expire_date))
+            else:
+                data = {}
+        self._loaded_digest = self._digest(data)
+        return data
+
+    def save(self, must_create=False):
+        if must_create or self.session_key is None:
+            return self._write(must_create)
+
+        data = self._get_session()
+        loaded_digest = getattr(self, '_loaded_digest', None)
+        if self._digest(data) != loaded_digest or '_session_expiry' in data:
+            # داده تغییر کرده یا انقضای سفارشی دارد؛ نوشتن کامل لازم است
+            return self._write(must_create)
+
+        refresh = getattr(settings, 'SESSION_WRITE_REFRESH', 3600)
+        expiry_age = self.get_expiry_age()
+        synced_expiry = getattr(self, '_synced_expiry', None)
+        if synced_expiry and synced_expiry - time.time() > expiry_age - refresh:
+            stats['skipped'] += 1
+            return
+
+        self._synced_expiry = time.time() + expiry_age
+        try:
+            self._cache.set_many({
+                self.cache_key: data,
+                self.expiry_cache_key: self._synced_expiry,
+            }, expiry_age)
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+        stats['touches'] += 1
+        _queue_touch(self.session_key)
+
+    def _write(self, must_create):
+        super().save(must_create)
+        stats['db_writes'] += 1
+        self._synced_expiry = time.time() + self.get_expiry_age()
+        self._loaded_digest = self._digest(self._session)
+        try:
+            self._cache.set(self.expiry_cache_key, self._synced_expiry, self.get_expiry_age())
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+
+    def delete(self, session_key=None):
+        key = session_key or self.session_key
+        super().delete(session_key)
+        if key is not None:
+            self._cache.delete(self.cache_key_prefix + key + ':expiry')
@@ -0,0 +1,52 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import search
+from .backends import invalidate_user
+from .cache import bump_version, exam_scope
+from .models import User, Subject, Exam, Question, StudentExam
+
+
+@receiver([post_save, post_delete], sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def subjects_changed(sender, instance, **kwargs):
+    bump_version('subjects')
+
+
+@receiver([post_save, post_delete], sender=Exam)
+def exam_changed(sender, instance, **kwargs):
+    bump_version('exams', exam_scope(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, **kwargs):
+    bump_version(exam_scope(instance.exam_id))
+
+
+@receiver(post_save, sender=StudentExam)
+def submission_changed(sender, instance, **kwargs):
+    # کارت آزمون در داشبورد معلم تعداد ارسال‌ها را نشان می‌دهد
+    if instance.is_finished:
+        bump_version(exam_scope(instance.exam_id))
+
+
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Exam)
+@receiver(post_save, sender=Question)
+def update_search_entry(sender, instance, update_fields=None, **kwargs):
+    # Subject.soft_delete ورودی درس را خودش حذف می‌کند
+    if getattr(instance, 'deleted_at', None):
+        return
+    if not update_fields or search.INDEXED_FIELDS.intersection(update_fields):
+        search.index([instance])
+
+
+@receiver(post_delete, sender=Subject)
+@receiver(post_delete, sender=Question)
+def drop_search_entry(sender, instance, **kwargs):
+    # ورودی‌های آزمون با کلید خارجی exam همراه آن حذف می‌شوند
+    search.unindex(sender._meta.model_name, instance.pk)
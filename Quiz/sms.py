@@ -0,0 +1,202 @@
+import json
+import logging
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('quiz')
+
+
+class SmsError(Exception):
+    pass
+
+
+class RateLimiter:
+    """Spaces calls so that at most `rate` of them start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(backend):
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get(backend.name)
+        if limiter is None:
+            limiter = _rate_limiters[backend.name] = RateLimiter(backend.rate_limit)
+        return limiter
+
+
+class BaseSmsBackend:
+    # حداکثر تعداد پیامک در ثانیه برای این سرویس (None یعنی بدون محدودیت)
+    rate_limit = None
+
+    def __init__(self, **kwargs):
+        self.name = f"{type(self).__module__}.{type(self).__qualname__}"
+        self.rate_limit = getattr(settings, 'SMS_RATE_LIMITS', {}).get(self.name, self.rate_limit)
+
+    def send(self, phone, text):
+        """Send one message and return the provider's message id (or '')."""
+        raise NotImplementedError
+
+
+class ConsoleBackend(BaseSmsBackend):
+    lock = threading.Lock()
+
+    def send(self, phone, text):
+        with self.lock:
+            print("\n************ SMS ************")
+            print(f"To: {phone}")
+            print(text)
+            print("*****************************\n")
+        return ''
+
+
+class FileBackend(BaseSmsBackend):
+    lock = threading.Lock()
+
+    def __init__(self, file_path=None, **kwargs):
+        super().__init__(**kwargs)
+        self.file_path = Path(file_path or settings.SMS_FILE_PATH)
+
+    def send(self, phone, text):
+        line = json.dumps({'to': phone, 'text': text, 'at': timezone.now().isoformat()}, ensure_ascii=False)
+        with self.lock:
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.file_path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        return ''
+
+
+# صندوق خروجی برای تست‌ها، مشابه django.core.mail.outbox
+outbox = []
+
+
+class LocMemBackend(BaseSmsBackend):
+    lock = threading.Lock()
+
+    def send(self, phone, text):
+        with self.lock:
+            outbox.append({'to': phone, 'text': text})
+            return str(len(outbox))
+
+
+class HttpBackend(BaseSmsBackend):
+    """
+    Posts `{"to", "text", "sender"}` as JSON to SMS_GATEWAY_URL and expects a
+    2xx response, optionally with an `id` field. A local stub server speaking
+    the same protocol can stand in for the real gateway.
+    """
+    rate_limit = 10
+
+    def __init__(self, url=None, api_key=None, sender=None, timeout=None, **kwargs):
+        super().__init__(**kwargs)
+        self.url = url or settings.SMS_GATEWAY_URL
+        self.api_key = api_key or getattr(settings, 'SMS_GATEWAY_API_KEY', '')
+        self.sender = sender or getattr(settings, 'SMS_SENDER', '')
+        self.timeout = timeout or getattr(settings, 'SMS_GATEWAY_TIMEOUT', 10)
+
+    def send(self, phone, text):
+        payload = json.dumps({'to': phone, 'text': text, 'sender': self.sender}).encode('utf-8')
+        request = urllib.request.Request(self.url, data=payload, method='POST', headers={
+            'Content-Type': 'application/json',
+            'Authorization': f"Bearer {self.api_key}",
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+        except OSError as e:
+            raise SmsError(str(e)) from e
+        try:
+            return str(json.loads(body or b'{}').get('id', ''))
+        except (ValueError, AttributeError):
+            return ''
+
+
+def get_backend(backend=None, **kwargs):
+    return import_string(backend or settings.SMS_BACKEND)(**kwargs)
+
+
+def _deliver(backend, limiter, message, text):
+    limiter.acquire()
+    try:
+        message.provider_id = backend.send(message.phone, text)
+        message.status = 'sent'
+        message.sent_at = timezone.now()
+    except Exception as e:
+        logger.warning("SMS to %s failed: %s", message.phone, e)
+        message.status = 'failed'
+        message.error = str(e)[:255]
+    return message
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """One pool per process, shared by every send; SMS_MAX_WORKERS bounds its threads."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'SMS_MAX_WORKERS', 8),
+                                           thread_name_prefix='sms')
+        return _executor
+
+
+def redact(text, secrets):
+    for secret in secrets:
+        text = text.replace(secret, '*' * len(secret))
+    return text
+
+
+def send_mass_sms(messages, backend=None, secrets=()):
+    """
+    Send `(phone, text)` pairs through the shared thread pool, honouring the
+    backend's rate limit, and record each message's status in SmsMessage.
+    Any of `secrets` (e.g. an OTP code) is masked in the stored body.
+    """
+    from .models import SmsMessage
+
+    backend = backend or get_backend()
+    limiter = get_rate_limiter(backend)
+    messages = list(messages)
+    records = SmsMessage.objects.bulk_create([
+        SmsMessage(phone=phone, body=redact(text, secrets), backend=backend.name) for phone, text in messages
+    ])
+    if not records:
+        return []
+
+    if len(records) == 1:
+        records = [_deliver(backend, limiter, records[0], messages[0][1])]
+    else:
+        records = list(get_executor().map(lambda pair: _deliver(backend, limiter, *pair),
+                                          zip(records, [text for _, text in messages])))
+
+    SmsMessage.objects.bulk_update(records, ['status', 'error', 'provider_id', 'sent_at'])
+    return records
+
+
+def send_sms(phone, text, backend=None, secrets=()):
+    return send_mass_sms([(phone, text)], backend=backend, secrets=secrets)[0]
@@ -0,0 +1,34 @@
+from django import template
+
+from Quiz.cache import get_or_build
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+    def __init__(self, nodelist, name, scopes):
+        self.nodelist = nodelist
+        self.name = name
+        self.scopes = scopes
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        scopes = [str(scope.resolve(context)) for scope in self.scopes]
+        return get_or_build(name, scopes, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def versioned_cache(parser, token):
+    """
+    Cache a shared template fragment until one of its scopes changes::
+
+        {% versioned_cache "exam_card" exam.cache_scope "subjects" %}
+            ...
+        {% endversioned_cache %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and at least one scope")
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    return VersionedCacheNode(nodelist, parser.compile_filter(bits[1]), [parser.compile_filter(b) for b in bits[2:]])
@@ -1,6 +1,40 @@
-from django.test import TestCase
+import csv
+import io
+import logging
+import os
+import re
+import json
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from django.conf import settings
+from django.core import mail
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from .models import Exam, Subject
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from . import db_routers, metrics, proctoring, ratelimit, search, sms, urls as quiz_urls
+from .cache import fragment_stats
+from .middleware import PerformanceMiddleware
+from .log import JsonFormatter, QueueListenerHandler, RequestContextFilter, SamplingFilter, request_context
+from .backends import CachedModelBackend, user_cache_key
+from .management.commands.loadtest import percentile
+from .models import (MAX_EXAM_DURATION_MINUTES, OTP, Answer, ArchivedAttempt, Choice, Exam, Question, Roster,
+                     StudentExam, Subject, SmsMessage, assign_rosters)
 
 User = get_user_model()
 
@@ -34,3 +68,1191 @@ class ExamTests(TestCase):
 
     def test_exam_str(self):
         self.assertEqual(str(self.exam), 'Midterm - Math')
+
+
+@override_settings(SMS_BACKEND='Quiz.sms.LocMemBackend')
+class SmsTests(TestCase):
+    def setUp(self):
+        sms.outbox.clear()
+
+    def test_mass_send_records_status(self):
+        records = sms.send_mass_sms([(f"0912{i:07d}", "hello") for i in range(20)])
+        self.assertEqual(len(sms.outbox), 20)
+        self.assertEqual(SmsMessage.objects.filter(status='sent').count(), 20)
+        self.assertTrue(all(r.provider_id for r in records))
+
+    def test_verify_sms_uses_backend(self):
+        self.client.post(reverse('Quiz:verify_sms'), {'phone': '09120000000'})
+        self.assertEqual(len(sms.outbox), 1)
+        self.assertEqual(sms.outbox[0]['to'], '09120000000')
+        code = OTP.objects.get(phone='09120000000').code
+        self.assertIn(code, sms.outbox[0]['text'])
+        self.assertNotIn(code, SmsMessage.objects.get().body)
+
+    def test_http_backend_against_stub(self):
+        received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+                status = 500 if received[-1]['to'] == 'bad' else 200
+                self.send_response(status)
+                self.end_headers()
+                self.wfile.write(json.dumps({'id': len(received)}).encode())
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+
+        backend = sms.HttpBackend(url=f"http://127.0.0.1:{server.server_port}/send")
+        records = sms.send_mass_sms([('0912', 'a'), ('bad', 'b')], backend=backend)
+        self.assertEqual(len(received), 2)
+        self.assertEqual([r.status for r in records], ['sent', 'failed'])
+
+
+# یک پردازه‌ی تست، کش محلی را عملاً مشترک می‌کند؛ همان تنظیمات نشست با کش مشترک
+SHARED_CACHE_SESSIONS = {'SESSION_ENGINE': 'Quiz.sessions', 'SESSION_SAVE_EVERY_REQUEST': True}
+
+
+@override_settings(**SHARED_CACHE_SESSIONS)
+class SessionBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='s1', password='p1', user_type='student')
+        self.client.login(username='s1', password='p1')
+
+    def session_writes(self, ctx):
+        return [q for q in ctx.captured_queries
+                if 'django_session' in q['sql'] and not q['sql'].startswith('SELECT')]
+
+    def test_unchanged_session_is_not_rewritten(self):
+        url = reverse('Quiz:student_dashboard')
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(5):
+                self.client.get(url)
+        self.assertEqual(self.session_writes(ctx), [])
+
+    @override_settings(SESSION_WRITE_REFRESH=0, SESSION_TOUCH_BATCH_SIZE=1)
+    def test_expiry_refresh_is_flushed_as_update(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('Quiz:student_dashboard'))
+        writes = self.session_writes(ctx)
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0]['sql'].startswith('UPDATE'))
+
+    def test_write_stats_command(self):
+        out = io.StringIO()
+        call_command('session_write_stats', sessions=2, requests=5, stdout=out)
+        self.assertIn('Quiz.sessions', out.getvalue())
+
+
+class CachedUserBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = User.objects.create_user(username='s1', password='p1', user_type='student')
+
+    def test_role_check_needs_no_query(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.student.pk)
+        with self.assertNumQueries(0):
+            user = backend.get_user(self.student.pk)
+            self.assertEqual(user.user_type, 'student')
+            self.assertEqual(user.get_session_auth_hash(), self.student.get_session_auth_hash())
+
+    def test_deactivation_invalidates(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.student.pk)
+        self.student.is_active = False
+        self.student.save()
+        self.assertIsNone(backend.get_user(self.student.pk))
+
+    def test_snapshot_leaves_out_the_password_hash(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.student.pk)
+        snapshot = cache.get(user_cache_key(self.student.pk))
+        self.assertNotIn(self.student.password, snapshot.values())
+        self.assertNotIn('password', snapshot)
+        user = backend.get_user(self.student.pk)
+        self.assertIn('email', user.get_deferred_fields())
+        self.assertEqual(user.date_joined, self.student.date_joined)
+
+    def test_queryset_update_invalidates(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.student.pk)
+        User.students.filter(pk=self.student.pk).update(is_active=False)
+        self.assertIsNone(backend.get_user(self.student.pk))
+
+    def test_password_change_logs_out_sessions(self):
+        self.client.login(username='s1', password='p1')
+        url = reverse('Quiz:student_dashboard')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.student.set_password('p2')
+        self.student.save()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+class ImportRosterTests(TestCase):
+    def write_roster(self, rows):
+        f = tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8')
+        self.addCleanup(os.remove, f.name)
+        with f:
+            f.write('username,email,password,phone_number\n')
+            f.writelines(f"{','.join(row)}\n" for row in rows)
+        return f.name
+
+    def test_import_creates_inactive_users_and_queues_emails(self):
+        User.objects.create_user(username='taken', user_type='student')
+        path = self.write_roster([
+            ('a1', 'a1@example.com', 'secret-1', '09120000001'),
+            ('a2', 'a2@example.com', '', ''),
+            ('taken', 'x@example.com', '', ''),
+        ])
+        credentials = path + '.credentials.csv'
+        self.addCleanup(os.remove, credentials)
+        call_command('import_roster', path, workers=1, iterations=1000, credentials_out=credentials,
+                     stdout=io.StringIO(), stderr=io.StringIO())
+
+        a1 = User.students.get(username='a1')
+        self.assertFalse(a1.is_active)
+        self.assertEqual(a1.phone_number, '09120000001')
+        self.assertTrue(a1.check_password('secret-1'))
+        with open(credentials, encoding='utf-8') as f:
+            (username, password), = list(csv.reader(f))[1:]
+        self.assertEqual(username, 'a2')
+        self.assertTrue(User.students.get(username='a2').check_password(password))
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_generated_passwords_need_credentials_out(self):
+        path = self.write_roster([('c1', 'c1@example.com', '', '')])
+        with self.assertRaisesMessage(CommandError, '--credentials-out'):
+            call_command('import_roster', path, workers=1, stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username='c1').exists())
+        self.assertEqual(mail.outbox, [])
+
+    def test_unwritable_credentials_file_creates_nobody(self):
+        path = self.write_roster([('e1', '', '', '')])
+        with self.assertRaisesMessage(CommandError, 'Cannot write credentials'):
+            call_command('import_roster', path, workers=1, credentials_out=os.path.join(path, 'out.csv'),
+                         stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username='e1').exists())
+
+    def test_emails_are_sent_in_parallel_batches(self):
+        path = self.write_roster([(f"d{i}", f"d{i}@example.com", 'secret', '') for i in range(5)])
+        call_command('import_roster', path, workers=1, iterations=1000, batch_size=2, email_workers=3,
+                     stdout=io.StringIO())
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f"d{i}@example.com" for i in range(5)])
+
+    def test_dry_run_writes_nothing(self):
+        path = self.write_roster([('b1', '', 'secret', '')])
+        call_command('import_roster', path, dry_run=True, stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(username='b1').exists())
+
+
+@override_settings(**SHARED_CACHE_SESSIONS)
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        self.client.login(username='t1', password='p1')
+        Subject.objects.create(name='Math')
+
+    def test_subject_list_is_cached_until_subjects_change(self):
+        url = reverse('Quiz:subject_list')
+        self.client.get(url)
+        hits = fragment_stats().get('subject_list:hit', 0)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Math')
+        self.assertEqual(fragment_stats()['subject_list:hit'], hits + 1)
+
+        Subject.objects.create(name='Physics')
+        self.assertContains(self.client.get(url), 'Physics')
+
+    def test_student_dashboard_filters_by_cached_subjects(self):
+        physics = Subject.objects.create(name='Physics')
+        for subject in Subject.objects.all():
+            Exam.objects.create(
+                teacher=self.teacher, subject=subject, title=f"{subject.name} final",
+                start_date=timezone.now(), duration_minutes=60, total_score=20,
+            )
+        User.objects.create_user(username='s1', password='p1', user_type='student')
+        self.client.login(username='s1', password='p1')
+        url = reverse('Quiz:student_dashboard')
+        response = self.client.get(url, {'subject': physics.pk})
+        self.assertContains(response, f'<option value="{physics.pk}" selected>Physics</option>', html=True)
+        self.assertContains(response, 'Physics final')
+        self.assertNotContains(response, 'Math final')
+
+    def test_exam_card_reflects_new_questions(self):
+        exam = Exam.objects.create(
+            teacher=self.teacher, subject=Subject.objects.get(), title='Final',
+            start_date=timezone.now(), duration_minutes=60, total_score=20,
+        )
+        url = reverse('Quiz:teacher_dashboard')
+        self.assertContains(self.client.get(url), '<span class="badge bg-primary ms-1">0</span>', html=True)
+        exam.questions.create(question_type='short', text='Why?')
+        self.assertContains(self.client.get(url), '<span class="badge bg-primary ms-1">1</span>', html=True)
+
+
+REPLICA_DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.router = db_routers.ReplicaRouter()
+
+    def read_inside_view(self):
+        return db_routers.read_replica(lambda: self.router.db_for_read(Exam))()
+
+    def test_designated_views_read_from_replica(self):
+        with self.settings(DATABASES=REPLICA_DATABASES):
+            self.assertEqual(self.read_inside_view(), 'replica')
+            self.assertEqual(self.router.db_for_read(Exam), 'default')
+
+    def test_falls_back_without_replica_alias(self):
+        self.assertEqual(self.read_inside_view(), 'default')
+
+    def test_reads_stick_to_primary_after_write(self):
+        with self.settings(DATABASES=REPLICA_DATABASES):
+            tokens = db_routers.begin_request(pinned=False)
+            self.router.db_for_write(Exam)
+            self.assertEqual(self.read_inside_view(), 'default')
+            self.assertTrue(db_routers.end_request(tokens))
+
+            tokens = db_routers.begin_request(pinned=True)
+            self.assertEqual(self.read_inside_view(), 'default')
+            db_routers.end_request(tokens)
+
+    def test_write_sets_sticky_cookie(self):
+        User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        self.client.login(username='t1', password='p1')
+        response = self.client.post(reverse('Quiz:create_subject'), {'name': 'Math'})
+        self.assertIn('primary_pin', response.cookies)
+        response = self.client.get(reverse('Quiz:subject_list'))
+        self.assertNotIn('primary_pin', response.cookies)
+
+
+class LoggingPipelineTests(TestCase):
+    def test_listener_drains_queue_on_stop(self):
+        records = []
+        target = logging.Handler()
+        target.emit = records.append
+        sink = logging.getLogger('quiz.test.sink')
+        sink.addHandler(target)
+        self.addCleanup(sink.removeHandler, target)
+        handler = QueueListenerHandler(sink='quiz.test.sink')
+        handler.addFilter(RequestContextFilter())
+        handler.start()
+
+        token = request_context.set({'request_id': 'abc', 'user_id': 7, 'view_name': 'Quiz:home'})
+        try:
+            for i in range(100):
+                handler.handle(logging.makeLogRecord({'msg': 'visit %d', 'args': (i,), 'name': 'quiz', 'levelno': logging.INFO}))
+        finally:
+            request_context.reset(token)
+        handler.stop()
+
+        self.assertEqual(len(records), 100)
+        payload = json.loads(JsonFormatter().format(records[-1]))
+        self.assertEqual(payload['message'], 'visit 99')
+        self.assertEqual((payload['request_id'], payload['user_id'], payload['view']), ('abc', 7, 'Quiz:home'))
+
+    def test_sampling_keeps_warnings(self):
+        sampler = SamplingFilter(rates={'django.server': 0})
+        self.assertFalse(sampler.filter(logging.makeLogRecord({'name': 'django.server', 'levelno': logging.INFO})))
+        self.assertTrue(sampler.filter(logging.makeLogRecord({'name': 'django.server', 'levelno': logging.ERROR})))
+        self.assertTrue(sampler.filter(logging.makeLogRecord({'name': 'quiz', 'levelno': logging.INFO})))
+
+    def test_response_carries_request_id(self):
+        response = self.client.get(reverse('Quiz:login'), HTTP_X_REQUEST_ID='req-1')
+        self.assertEqual(response['X-Request-ID'], 'req-1')
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0, METRICS_N_PLUS_ONE_THRESHOLD=3)
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        self.client.login(username='t1', password='p1')
+
+    def test_metrics_endpoint_reports_view_histograms(self):
+        self.client.get(reverse('Quiz:subject_list'))
+        body = self.client.get(reverse('Quiz:metrics')).content.decode()
+        self.assertIn('quiz_request_duration_seconds_count{view="Quiz:subject_list"} 1', body)
+        self.assertIn('quiz_request_queries_bucket{view="Quiz:subject_list",le="+Inf"} 1', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_proxied_requests_need_the_token(self):
+        self.client.logout()
+        url = reverse('Quiz:metrics')
+        self.assertEqual(self.client.get(url, HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 403)
+        response = self.client.get(url, HTTP_X_FORWARDED_FOR='203.0.113.5', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_workers_claim_separate_slots(self):
+        metrics.flush()
+        first = metrics._slot
+        metrics.flush()
+        self.assertEqual(metrics._slot, first)
+        cache.set(first, {'worker': 'other:1', 'histograms': [], 'counters': [['quiz_n_plus_one_total', 'x', 2]]})
+        metrics.flush()
+        self.assertNotEqual(metrics._slot, first)
+        self.assertIn('quiz_n_plus_one_total{view="x"} 2', metrics.render_prometheus())
+
+    def test_repeated_query_shape_is_flagged(self):
+        for i in range(5):
+            Subject.objects.create(name=f"S{i}")
+        view = lambda request: HttpResponse(str([s.exam_set.count() for s in Subject.objects.all()]))
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        with self.assertLogs('quiz', 'WARNING') as logs:
+            PerformanceMiddleware(view)(request)
+        self.assertIn('Possible N+1', logs.output[0])
+        self.assertIn('quiz_n_plus_one_total{view="unresolved"} 1', metrics.render_prometheus())
+
+
+class LoadTestCommandTests(TestCase):
+    def test_percentile_is_nearest_rank(self):
+        self.assertEqual(percentile([2, 1], 50), 1)
+        self.assertEqual(percentile(list(range(1, 101)), 95), 95)
+        self.assertEqual(percentile([5], 99), 5)
+        self.assertEqual(percentile([3, 1, 2], 0), 1)
+        self.assertIsNone(percentile([], 50))
+
+    def test_reports_every_scenario_and_cleans_up(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            call_command('loadtest', students=3, exams=1, questions=4, autosaves=2,
+                         output=path, stdout=io.StringIO())
+            with open(path) as f:
+                report = json.load(f)
+
+        self.assertEqual(set(report['scenarios']), {
+            'mass_enroll', 'take_exam', 'autosave_burst', 'deadline_submit', 'teacher_grading',
+        })
+        for result in report['scenarios'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertIsNotNone(result['latency_ms']['p95'])
+            self.assertGreater(result['queries_per_request']['mean'], 0)
+        self.assertFalse(User.objects.filter(username__startswith='loadtest_').exists())
+
+
+def build_budget_fixture(n, prefix):
+    """یک معلم، یک دانش‌آموز بیننده و n ردیف از هر چیز دیگر."""
+    now = timezone.now()
+    teacher = User.objects.create_user(username=f"{prefix}_teacher", user_type='teacher')
+    viewer = User.objects.create_user(username=f"{prefix}_viewer", user_type='student')
+    staff = User.objects.create_user(username=f"{prefix}_staff", user_type='teacher', is_staff=True)
+    students = User.objects.bulk_create([
+        User(username=f"{prefix}_s{i}", user_type='student') for i in range(n)
+    ])
+    subjects = Subject.objects.bulk_create([Subject(name=f"{prefix} subject {i}") for i in range(n)])
+    exams = Exam.objects.bulk_create([
+        Exam(teacher=teacher, subject=subjects[i % n], title=f"{prefix} exam {i}",
+             start_date=now, duration_minutes=60, total_score=20)
+        for i in range(2 * n)
+    ])
+    focus, live = exams[0], exams[1]
+    questions = Question.objects.bulk_create([
+        Question(exam=exam, question_type=('mcq', 'short', 'long')[i % 3], text=f"q{i}", model_answer='x')
+        for exam in (focus, live) for i in range(n)
+    ])
+    Choice.objects.bulk_create([
+        Choice(question=q, text=f"c{j}", is_correct=j == 0)
+        for q in questions if q.question_type == 'mcq' for j in range(4)
+    ])
+    questions = questions[:n]
+    attempts = StudentExam.objects.bulk_create(
+        [StudentExam(student=viewer, exam=exam, started_at=now, is_finished=True) for exam in exams[2:n]]
+        + [StudentExam(student=s, exam=focus, started_at=now, is_finished=True) for s in students]
+    )
+    result = StudentExam.objects.create(student=viewer, exam=focus, started_at=now, is_finished=True)
+    ongoing = StudentExam.objects.create(student=viewer, exam=live, started_at=now)
+    Answer.objects.bulk_create([Answer(student_exam=result, question=q, answer_text='x') for q in questions])
+    upload = Question.objects.create(exam=focus, question_type='file', text='upload')
+    Answer.objects.create(student_exam=result, question=upload, uploaded_file='answers/files/sheet.pdf')
+    roster = Roster.objects.create(teacher=teacher, name=f"{prefix} roster")
+    roster.students.add(*students)
+    roster.exams.add(focus)
+    return {
+        'teacher': teacher, 'student': viewer, 'staff': staff, 'anonymous': None,
+        'exam': focus.pk, 'available': exams[-1].pk, 'question': questions[0].pk,
+        'result': result.pk, 'ongoing': ongoing.pk, 'upload': upload.pk, 'submission': attempts[-1].pk,
+        'roster': roster.pk,
+        'uid': urlsafe_base64_encode(force_bytes(viewer.pk)),
+    }
+
+
+# فایل واقعی لازم نیست؛ فقط هدر X-Sendfile ساخته می‌شود
+@override_settings(FILE_DOWNLOAD_ACCEL='x-sendfile', **SHARED_CACHE_SESSIONS)
+class QueryBudgetTests(TestCase):
+    """
+    Every named URL is requested once at a small and a large fixture size: the
+    query count must not grow with the data and must stay within its budget.
+    Budgets include the session and user lookups of a cold cache; lower them
+    when a view gets cheaper.
+    """
+
+    SMALL, LARGE = 10, 1000
+
+    # name: (user, url kwargs — fixture keys or literals, max queries)
+    BUDGETS = {
+        'home': ('anonymous', {}, 0),
+        'login': ('anonymous', {}, 0),
+        'logout': ('student', {}, 3),
+        'teacher_register': ('anonymous', {}, 0),
+        'student_register': ('anonymous', {}, 0),
+        'activate': ('anonymous', {'uidb64': 'uid', 'token': 'expired-token'}, 1),
+        'verify_sms': ('anonymous', {}, 0),
+        'teacher_dashboard': ('teacher', {}, 2),
+        'student_dashboard': ('student', {}, 4),
+        'subject_list': ('teacher', {}, 2),
+        'search': ('teacher', {}, 2),
+        'roster_list': ('teacher', {}, 2),
+        'edit_roster': ('teacher', {'roster_id': 'roster'}, 3),
+        'create_subject': ('teacher', {}, 1),
+        'create_exam': ('teacher', {}, 3),
+        'edit_exam': ('teacher', {'exam_id': 'exam'}, 5),
+        'delete_exam': ('teacher', {'exam_id': 'exam'}, 3),
+        'copy_exam': ('teacher', {'exam_id': 'exam'}, 3),
+        'add_questions': ('teacher', {'exam_id': 'exam'}, 5),
+        'edit_question': ('teacher', {'question_id': 'question'}, 4),
+        'delete_question': ('teacher', {'question_id': 'question'}, 3),
+        'enroll_exam': ('student', {'exam_id': 'available'}, 7),
+        'take_exam': ('student', {'student_exam_id': 'ongoing'}, 6),
+        'autosave_answer': ('student', {'student_exam_id': 'ongoing'}, 6),
+        'exam_result': ('student', {'student_exam_id': 'result'}, 3),
+        'answer_file': ('student', {'student_exam_id': 'result', 'question_id': 'upload'}, 3),
+        'grade_exam': ('teacher', {'exam_id': 'exam'}, 6),
+        'download_submissions': ('teacher', {'exam_id': 'exam'}, 4),
+        'grade_student_answers': ('teacher', {'student_exam_id': 'submission'}, 4),
+        'proctor_exam': ('teacher', {'exam_id': 'exam'}, 2),
+        'proctor_snapshot': ('teacher', {'exam_id': 'exam'}, 2),
+        'cache_stats': ('staff', {}, 1),
+        'metrics': ('staff', {}, 1),
+    }
+    # views that only accept POST
+    POST_DATA = {'autosave_answer': {}}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fixtures = {n: build_budget_fixture(n, f"budget{n}") for n in (cls.SMALL, cls.LARGE)}
+
+    def measure(self, name, n):
+        role, kwargs, _ = self.BUDGETS[name]
+        fixture = self.fixtures[n]
+        url = reverse(f"Quiz:{name}", kwargs={key: fixture.get(value, value) for key, value in kwargs.items()})
+        cache.clear()
+        self.client.logout()
+        if fixture[role] is not None:
+            self.client.force_login(fixture[role])
+        with CaptureQueriesContext(connection) as queries:
+            if name in self.POST_DATA:
+                response = self.client.post(url, self.POST_DATA[name])
+            else:
+                response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f"{name}: {response.status_code}")
+        return queries.captured_queries
+
+    def describe(self, captured):
+        # captured_queries مقادیر را در SQL جایگذاری کرده است
+        shapes = Counter(re.sub(r"'[^']*'|\b\d+\b", '%s', query['sql']) for query in captured)
+        return '\n'.join(f"{count}x {sql}" for sql, count in shapes.most_common() if count > 1)
+
+    def test_every_named_url_has_a_budget(self):
+        names = {pattern.name for pattern in quiz_urls.urlpatterns if pattern.name}
+        self.assertEqual(names, set(self.BUDGETS))
+
+    def test_query_counts_are_flat_and_within_budget(self):
+        for name, (_, _, budget) in self.BUDGETS.items():
+            with self.subTest(view=name):
+                small = self.measure(name, self.SMALL)
+                large = self.measure(name, self.LARGE)
+                self.assertEqual(len(small), len(large), f"{name} grows with data:\n{self.describe(large)}")
+                self.assertLessEqual(len(large), budget, f"{name} over budget:\n{self.describe(large)}")
+
+
+class ExamScheduleTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.teacher = User.objects.create_user(username='t1', user_type='teacher')
+        self.student = User.objects.create_user(username='s1', password='p1', user_type='student',
+                                                phone_number='09120000000')
+        self.subject = Subject.objects.create(name='Math')
+        self.exams = {
+            status: Exam.objects.create(teacher=self.teacher, subject=self.subject, title=status,
+                                        start_date=self.now + timezone.timedelta(minutes=offset),
+                                        duration_minutes=60, total_score=20)
+            for status, offset in (('closed', -90), ('live', -30), ('upcoming', 10))
+        }
+
+    def test_status_is_computed_in_sql(self):
+        exams = Exam.objects.with_schedule(self.now)
+        self.assertEqual({e.title: e.status for e in exams}, {s: s for s in self.exams})
+        self.assertEqual([e.title for e in Exam.objects.live(self.now)], ['live'])
+        live = exams.get(title='live')
+        self.assertEqual(live.ends_at, live.end_time)
+        # کران روی start_date تا نمایه‌ی آن به کار رود
+        self.assertIn('"start_date" >', str(Exam.objects.open(self.now).query))
+
+    def test_duration_cap_is_enforced_by_the_database(self):
+        exam = self.exams['live']
+        exam.duration_minutes = MAX_EXAM_DURATION_MINUTES + 1
+        with self.assertRaises(ValidationError):
+            exam.full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Exam.objects.filter(pk=exam.pk).update(duration_minutes=MAX_EXAM_DURATION_MINUTES + 1)
+
+    def test_enrollment_is_limited_to_the_exam_window(self):
+        self.client.login(username='s1', password='p1')
+        response = self.client.get(reverse('Quiz:enroll_exam', args=[self.exams['closed'].pk]))
+        self.assertRedirects(response, reverse('Quiz:student_dashboard'))
+        self.assertFalse(StudentExam.objects.filter(exam=self.exams['closed']).exists())
+
+        self.client.get(reverse('Quiz:enroll_exam', args=[self.exams['upcoming'].pk]))
+        attempt = StudentExam.objects.get(exam=self.exams['upcoming'])
+        self.assertIsNone(attempt.started_at)
+        response = self.client.get(reverse('Quiz:take_exam', args=[attempt.pk]))
+        self.assertRedirects(response, reverse('Quiz:student_dashboard'))
+
+        response = self.client.get(reverse('Quiz:enroll_exam', args=[self.exams['live'].pk]))
+        attempt = StudentExam.objects.get(exam=self.exams['live'])
+        self.assertRedirects(response, reverse('Quiz:take_exam', args=[attempt.pk]))
+
+    @override_settings(SMS_BACKEND='Quiz.sms.LocMemBackend')
+    def test_scheduler_handles_each_start_once(self):
+        sms.outbox.clear()
+        StudentExam.objects.create(student=self.student, exam=self.exams['upcoming'])
+        call_command('run_exam_scheduler', once=True, stdout=io.StringIO())
+        call_command('run_exam_scheduler', once=True, stdout=io.StringIO())
+        self.assertEqual([m['to'] for m in sms.outbox], ['09120000000'])
+        self.assertIsNotNone(cache.get(f"quiz:user:{self.student.pk}"))
+        self.exams['upcoming'].refresh_from_db()
+        self.assertIsNotNone(self.exams['upcoming'].reminder_sent_at)
+
+
+class ProctoringTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        self.student = User.objects.create_user(username='s1', password='p1', user_type='student')
+        self.exam = Exam.objects.create(teacher=self.teacher, subject=Subject.objects.create(name='Math'),
+                                        title='Live', start_date=now - timezone.timedelta(minutes=5),
+                                        duration_minutes=60, total_score=2)
+        self.mcq = Question.objects.create(exam=self.exam, question_type='mcq', text='q1')
+        self.right = Choice.objects.create(question=self.mcq, text='a', is_correct=True)
+        self.short = Question.objects.create(exam=self.exam, question_type='short', text='q2')
+
+    def test_autosave_stores_answers_and_updates_snapshot(self):
+        self.client.login(username='s1', password='p1')
+        self.client.get(reverse('Quiz:enroll_exam', args=[self.exam.pk]), follow=True)
+        attempt = StudentExam.objects.get(student=self.student)
+        url = reverse('Quiz:autosave_answer', args=[attempt.pk])
+
+        self.client.post(url, {f"question_{self.mcq.pk}": self.right.pk})
+        response = self.client.post(url, {f"question_{self.short.pk}": 'draft', 'question_999': 'x'})
+        self.assertEqual(response.json(), {'saved': 1})
+        answers = {a.question_id: a for a in attempt.answers.all()}
+        self.assertEqual(answers[self.mcq.pk].selected_choice, self.right)
+        self.assertEqual(answers[self.short.pk].answer_text, 'draft')
+
+        self.client.post(reverse('Quiz:take_exam', args=[attempt.pk]))
+        self.assertEqual(self.client.post(url, {f"question_{self.short.pk}": 'late'}).status_code, 404)
+        snapshot = proctoring.build_snapshot(self.exam.pk)
+        self.assertEqual(snapshot['counts'], {'started': 1, 'submitted': 1, 'idle': 0})
+        self.assertEqual(snapshot['students'][0]['student'], 's1')
+
+    @override_settings(PROCTOR_IDLE_SECONDS=0)
+    def test_polling_returns_one_shared_tick(self):
+        attempt = StudentExam.objects.create(student=self.student, exam=self.exam, started_at=timezone.now())
+        proctoring.record(attempt, 'started', 's1')
+        self.client.login(username='t1', password='p1')
+        url = reverse('Quiz:proctor_snapshot', args=[self.exam.pk])
+        snapshot = self.client.get(url).json()
+        self.assertEqual(snapshot['counts']['idle'], 1)
+        self.assertEqual(self.client.get(url, {'since': str(snapshot['at'])}).status_code, 204)
+        with self.assertNumQueries(0):
+            self.assertEqual(proctoring.tick(self.exam.pk), proctoring.tick(self.exam.pk))
+
+
+class SubmissionTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='s1', password='p1', user_type='student')
+        teacher = User.objects.create_user(username='t1', user_type='teacher')
+        self.exam = Exam.objects.create(teacher=teacher, subject=Subject.objects.create(name='Math'), title='Live',
+                                        start_date=timezone.now(), duration_minutes=60, total_score=2)
+        self.mcq = Question.objects.create(exam=self.exam, question_type='mcq', text='q1', marks=2)
+        self.right = Choice.objects.create(question=self.mcq, text='a', is_correct=True)
+        self.short = Question.objects.create(exam=self.exam, question_type='short', text='q2')
+        self.attempt = StudentExam.objects.create(student=self.student, exam=self.exam, started_at=timezone.now())
+
+    def test_replayed_submission_returns_stored_result(self):
+        self.client.login(username='s1', password='p1')
+        url = reverse('Quiz:take_exam', args=[self.attempt.pk])
+        data = {'submission_key': 'k1', f"question_{self.mcq.pk}": str(self.right.pk), f"question_{self.short.pk}": 'x'}
+        result = reverse('Quiz:exam_result', args=[self.attempt.pk])
+        self.assertRedirects(self.client.post(url, data), result)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, {**data, f"question_{self.short.pk}": 'changed'})
+        self.assertRedirects(response, result, fetch_redirect_response=False)
+        self.assertFalse([q for q in ctx.captured_queries
+                          if q['sql'].startswith(('UPDATE "Quiz_studentexam"', 'INSERT INTO "Quiz_answer"'))])
+
+        self.attempt.refresh_from_db()
+        self.assertEqual((self.attempt.score, self.attempt.version, self.attempt.submission_key), (2, 1, 'k1'))
+        self.assertEqual(sorted(self.attempt.answers.values_list('question_id', 'answer_text')),
+                         [(self.mcq.pk, None), (self.short.pk, 'x')])
+
+    def test_timer_counts_down_to_the_exam_end(self):
+        self.exam.start_date = timezone.now() - timezone.timedelta(minutes=50)
+        self.exam.save()
+        self.client.login(username='s1', password='p1')
+        response = self.client.get(reverse('Quiz:take_exam', args=[self.attempt.pk]))
+        self.assertLessEqual(response.context['remaining_seconds'], 600)
+
+    def test_late_submission_finishes_without_the_posted_answers(self):
+        self.attempt.started_at = timezone.now() - timezone.timedelta(minutes=61)
+        self.attempt.save(update_fields=['started_at'])
+        self.client.login(username='s1', password='p1')
+        response = self.client.post(reverse('Quiz:take_exam', args=[self.attempt.pk]),
+                                    {'submission_key': 'k1', f"question_{self.short.pk}": 'late'})
+        self.assertRedirects(response, reverse('Quiz:exam_result', args=[self.attempt.pk]))
+        self.attempt.refresh_from_db()
+        self.assertTrue(self.attempt.is_finished)
+        self.assertFalse(self.attempt.answers.filter(answer_text='late').exists())
+
+    def test_stale_instance_cannot_submit_twice(self):
+        first = StudentExam.objects.get(pk=self.attempt.pk)
+        second = StudentExam.objects.get(pk=self.attempt.pk)
+        self.assertTrue(first.submit({f"question_{self.short.pk}": 'a'}, key='k1'))
+        self.assertFalse(second.submit({f"question_{self.short.pk}": 'b'}, key='k2'))
+        self.assertEqual(second.submission_key, 'k1')
+        self.assertEqual(list(self.attempt.answers.values_list('answer_text', flat=True).order_by('question_id')),
+                         [None, 'a'])
+
+    def test_claim_retries_after_a_concurrent_write(self):
+        stale = StudentExam.objects.get(pk=self.attempt.pk)
+        self.attempt.claim()
+        self.assertTrue(stale.claim())
+        self.assertEqual(StudentExam.objects.get(pk=self.attempt.pk).version, 2)
+
+
+class AnswerArchiveTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='s1', password='p1', user_type='student')
+        teacher = User.objects.create_user(username='t1', user_type='teacher')
+        long_ago = timezone.now() - timezone.timedelta(days=400)
+        exam = Exam.objects.create(teacher=teacher, subject=Subject.objects.create(name='Math'), title='Old',
+                                   start_date=long_ago, duration_minutes=60, total_score=2)
+        self.attempt = StudentExam.objects.create(student=self.student, exam=exam, started_at=long_ago,
+                                                  finished_at=long_ago, is_finished=True, score=1)
+        self.pending = StudentExam.objects.create(student=teacher, exam=exam, started_at=long_ago,
+                                                  finished_at=long_ago, is_finished=True)
+        for n, attempt in enumerate((self.attempt, self.pending)):
+            question = Question.objects.create(exam=exam, question_type='short', text=f"q{n}")
+            Answer.objects.create(student_exam=attempt, question=question, answer_text='جواب نهایی',
+                                  marks_obtained=1, evaluated=attempt is self.attempt)
+
+    def test_archive_and_restore_round_trip(self):
+        original = list(Answer.objects.filter(student_exam=self.attempt).values())
+        call_command('archive_answers', stdout=io.StringIO())
+
+        self.attempt.refresh_from_db()
+        self.assertIsNotNone(self.attempt.archived_at)
+        self.assertFalse(Answer.objects.filter(student_exam=self.attempt).exists())
+        # تلاشی که هنوز پاسخ تصحیح‌نشده دارد در جدول اصلی می‌ماند
+        self.assertTrue(Answer.objects.filter(student_exam=self.pending).exists())
+
+        self.client.login(username='s1', password='p1')
+        response = self.client.get(reverse('Quiz:exam_result', args=[self.attempt.pk]))
+        self.assertContains(response, '<strong>سوال:</strong> q0')
+        self.assertEqual([a.answer_text for a in self.attempt.get_answers()], ['جواب نهایی'])
+
+        call_command('restore_answers', self.attempt.pk, stdout=io.StringIO())
+        self.assertEqual(list(Answer.objects.filter(student_exam=self.attempt).values()), original)
+        self.assertFalse(ArchivedAttempt.objects.exists())
+
+
+
+@override_settings(ANSWER_STORAGE='document')
+class AnswerSheetTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='s1', password='p1', user_type='student')
+        teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        self.exam = Exam.objects.create(teacher=teacher, subject=Subject.objects.create(name='Math'), title='Live',
+                                        start_date=timezone.now(), duration_minutes=60, total_score=2)
+        self.mcq = Question.objects.create(exam=self.exam, question_type='mcq', text='q1')
+        self.right = Choice.objects.create(question=self.mcq, text='a', is_correct=True)
+        self.short = Question.objects.create(exam=self.exam, question_type='short', text='q2')
+
+    def test_save_and_submit_write_one_row(self):
+        self.client.login(username='s1', password='p1')
+        self.client.get(reverse('Quiz:enroll_exam', args=[self.exam.pk]))
+        attempt = StudentExam.objects.get(student=self.student)
+        self.assertTrue(attempt.uses_answer_sheet)
+
+        data = {f"question_{self.mcq.pk}": str(self.right.pk), f"question_{self.short.pk}": 'draft'}
+        with CaptureQueriesContext(connection) as ctx:
+            attempt.save_answers(data)
+            attempt.submit()
+        writes = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        # ذخیره، ادعای نسخه و پایان تلاش
+        self.assertEqual(len(writes), 3)
+        self.assertTrue(all(sql.startswith('UPDATE "Quiz_studentexam"') for sql in writes))
+
+        attempt.refresh_from_db()
+        self.assertFalse(Answer.objects.exists())
+        self.assertEqual(attempt.score, 1)
+        self.assertTrue(StudentExam.objects.with_grading_status().get(pk=attempt.pk).has_pending_answers)
+        self.assertEqual({a.question_id: a.answer_text for a in attempt.get_answers()},
+                         {self.mcq.pk: None, self.short.pk: 'draft'})
+        response = self.client.get(reverse('Quiz:exam_result', args=[attempt.pk]))
+        self.assertContains(response, '<strong>سوال:</strong> q2')
+
+    def test_teacher_grades_answer_sheet_by_question(self):
+        attempt = StudentExam.objects.create(student=self.student, exam=self.exam, started_at=timezone.now())
+        attempt.submit({f"question_{self.mcq.pk}": str(self.right.pk), f"question_{self.short.pk}": 'draft'})
+        self.client.login(username='t1', password='p1')
+        url = reverse('Quiz:grade_student_answers', args=[attempt.pk])
+        self.assertContains(self.client.get(url), f'name="marks_{self.short.pk}"')
+
+        self.client.post(url, {f"marks_{self.short.pk}": '5'})
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.answer_sheet['answers'][str(self.short.pk)]['marks'], 1)
+        self.assertFalse(attempt.answer_sheet['pending'])
+        self.assertEqual(attempt.score, 2)
+
+    def test_attempt_in_progress_cannot_be_graded(self):
+        attempt = StudentExam.objects.create(student=self.student, exam=self.exam, started_at=timezone.now())
+        attempt.save_answers({f"question_{self.short.pk}": 'draft'})
+        self.client.login(username='t1', password='p1')
+        url = reverse('Quiz:grade_student_answers', args=[attempt.pk])
+        self.assertEqual(self.client.post(url, {f"marks_{self.short.pk}": '1'}).status_code, 404)
+        attempt.refresh_from_db()
+        self.assertNotIn('marks', attempt.answer_sheet['answers'][str(self.short.pk)])
+
+    def test_benchmark_compares_both_layouts(self):
+        out = io.StringIO()
+        call_command('answer_storage_benchmark', students=2, questions=4, autosaves=2, stdout=out)
+        lines = out.getvalue().splitlines()[1:]
+        self.assertEqual([line.split()[:2] for line in lines],
+                         [[layout, phase] for layout in ('rows', 'document') for phase in ('autosave', 'submit', 'result')])
+        self.assertFalse(Exam.objects.filter(title__startswith='bench').exists())
+
+
+class AnswerFileDownloadTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(media.name, 'answers', 'files'))
+        with open(os.path.join(media.name, 'answers', 'files', 'essay.txt'), 'wb') as f:
+            f.write(b'0123456789')
+
+        self.student = User.objects.create_user(username='s1', password='p1', user_type='student')
+        User.objects.create_user(username='s2', password='p1', user_type='student')
+        teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        exam = Exam.objects.create(teacher=teacher, subject=Subject.objects.create(name='Math'), title='Essay',
+                                   start_date=timezone.now(), duration_minutes=60, total_score=1)
+        question = Question.objects.create(exam=exam, question_type='file', text='upload')
+        attempt = StudentExam.objects.create(student=self.student, exam=exam, is_finished=True)
+        Answer.objects.create(student_exam=attempt, question=question, uploaded_file='answers/files/essay.txt')
+        self.url = reverse('Quiz:answer_file', args=[attempt.pk, question.pk])
+
+    def test_only_owner_and_teacher_can_download(self):
+        self.client.login(username='s2', password='p1')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.login(username='t1', password='p1')
+        response = self.client.get(self.url)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_range_and_conditional_requests(self):
+        self.client.login(username='s1', password='p1')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(b''.join(self.client.get(self.url, HTTP_RANGE='bytes=-3').streaming_content), b'789')
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=20-').status_code, 416)
+
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_missing_file_is_not_found(self):
+        os.remove(os.path.join(settings.MEDIA_ROOT, 'answers', 'files', 'essay.txt'))
+        self.client.login(username='s1', password='p1')
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'answers', 'files', 'essay.txt'))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @override_settings(FILE_DOWNLOAD_ACCEL='x-accel-redirect')
+    def test_hands_off_to_web_server(self):
+        self.client.login(username='s1', password='p1')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/answers/files/essay.txt')
+        self.assertEqual(response.content, b'')
+
+
+class SubmissionZipTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(media.name, 'answers', 'files'))
+
+        teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        self.exam = Exam.objects.create(teacher=teacher, subject=Subject.objects.create(name='Math'), title='Essay',
+                                        start_date=timezone.now(), duration_minutes=60, total_score=2)
+        questions = [Question.objects.create(exam=self.exam, question_type='file', text=f"upload {n}")
+                     for n in range(2)]
+        self.question = questions[0]
+        for name in ('ali', 'sara'):
+            attempt = StudentExam.objects.create(student=User.objects.create_user(username=name, user_type='student'),
+                                                 exam=self.exam, is_finished=True)
+            for question in questions:
+                path = f"answers/files/{name}-{question.pk}.txt"
+                if name == 'ali':
+                    with open(os.path.join(media.name, path), 'wb') as f:
+                        f.write(os.urandom(200 * 1024))
+                Answer.objects.create(student_exam=attempt, question=question, uploaded_file=path)
+        self.client.login(username='t1', password='p1')
+
+    def download(self, **params):
+        response = self.client.get(reverse('Quiz:download_submissions', args=[self.exam.pk]), params)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        chunks = list(response.streaming_content)
+        return chunks, zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+
+    def test_streams_files_and_manifest(self):
+        chunks, archive = self.download()
+        self.assertGreater(len(chunks), 4)
+        self.assertEqual(sorted(archive.namelist()), sorted([
+            f"ali/q{q.pk}-ali-{q.pk}.txt" for q in self.exam.questions.all()
+        ] + ['manifest.csv']))
+        self.assertIsNone(archive.testzip())
+        rows = list(csv.DictReader(io.StringIO(archive.read('manifest.csv').decode('utf-8-sig'))))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({r['status'] for r in rows if r['student'] == 'sara'}, {'missing'})
+        self.assertEqual({r['bytes'] for r in rows if r['student'] == 'ali'}, {str(200 * 1024)})
+
+    def test_single_question(self):
+        _, archive = self.download(question=self.question.pk)
+        self.assertEqual(archive.namelist(), [f"ali/q{self.question.pk}-ali-{self.question.pk}.txt", 'manifest.csv'])
+
+
+class AdminScaleTests(TestCase):
+    def setUp(self):
+        User.objects.create_superuser(username='admin', password='p1')
+        teacher = User.objects.create_user(username='t1', user_type='teacher')
+        self.exam = Exam.objects.create(teacher=teacher, subject=Subject.objects.create(name='Math'), title='Big',
+                                        start_date=timezone.now(), duration_minutes=60, total_score=1)
+        self.question = Question.objects.create(exam=self.exam, question_type='short', text='q')
+        self.client.login(username='admin', password='p1')
+
+    def add_attempts(self, n, prefix):
+        students = User.objects.bulk_create([User(username=f"{prefix}{i}", user_type='student') for i in range(n)])
+        attempts = StudentExam.objects.bulk_create([StudentExam(student=s, exam=self.exam) for s in students])
+        Answer.objects.bulk_create([Answer(student_exam=a, question=self.question, answer_text='x') for a in attempts])
+
+    def changelist_queries(self, model):
+        url = reverse(f"admin:Quiz_{model}_changelist")
+        self.client.get(url)  # کش کاربر و نشست گرم شود
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url, {'exam': self.exam.pk}).status_code, 200)
+        return len(ctx)
+
+    def test_changelist_queries_do_not_grow(self):
+        for model in ('studentexam', 'answer'):
+            self.add_attempts(5, f"{model}_small")
+            small = self.changelist_queries(model)
+            self.add_attempts(300, f"{model}_large")
+            self.assertEqual(self.changelist_queries(model), small, model)
+
+    def test_count_beyond_the_limit_reaches_every_page(self):
+        from .admin import EstimatedCountPaginator
+        self.add_attempts(30, 's')
+        with self.settings(ADMIN_EXACT_COUNT_LIMIT=10):
+            # SQLite برآورد برنامه‌ریز ندارد؛ شمارش کامل انجام می‌شود
+            paginator = EstimatedCountPaginator(Answer.objects.order_by('pk'), 5)
+            self.assertEqual(paginator.count, 30)
+            self.assertEqual(len(paginator.page(6)), 5)
+        self.assertEqual(EstimatedCountPaginator(Answer.objects.order_by('pk'), 5).count, 30)
+
+
+@override_settings(**SHARED_CACHE_SESSIONS)
+class SoftDeletePurgeTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = override_settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        os.makedirs(os.path.join(media.name, 'answers', 'files'))
+        self.media = media.name
+
+        self.teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        self.subject = Subject.objects.create(name='Math')
+        self.exam = Exam.objects.create(teacher=self.teacher, subject=self.subject, title='Old',
+                                        start_date=timezone.now(), duration_minutes=60, total_score=2)
+        mcq = Question.objects.create(exam=self.exam, question_type='mcq', text='q1')
+        choice = Choice.objects.create(question=mcq, text='a', is_correct=True)
+        upload = Question.objects.create(exam=self.exam, question_type='file', text='q2')
+        for n in range(7):
+            attempt = StudentExam.objects.create(
+                student=User.objects.create_user(username=f"s{n}", user_type='student'), exam=self.exam)
+            path = f"answers/files/s{n}.txt"
+            with open(os.path.join(self.media, path), 'wb') as f:
+                f.write(b'x')
+            Answer.objects.create(student_exam=attempt, question=mcq, selected_choice=choice)
+            Answer.objects.create(student_exam=attempt, question=upload, uploaded_file=path)
+
+    def test_delete_view_only_hides_exam(self):
+        self.client.login(username='t1', password='p1')
+        with self.assertNumQueries(3):
+            self.client.post(reverse('Quiz:delete_exam', args=[self.exam.pk]))
+        self.assertFalse(Exam.objects.filter(pk=self.exam.pk).exists())
+        self.assertTrue(Exam.all_objects.filter(pk=self.exam.pk).exists())
+        self.assertEqual(Answer.objects.count(), 14)
+        self.assertFalse(StudentExam.objects.visible().exists())
+
+    def test_purge_in_chunks_removes_rows_and_files(self):
+        self.subject.soft_delete()
+        self.assertFalse(Subject.objects.exists())
+        out = io.StringIO()
+        call_command('purge_deleted', '--once', '--chunk-size', '3', stdout=out)
+        self.assertEqual(out.getvalue().count('Old (#'), 5)  # ۳ تکه تلاش، ۱ تکه سوال، خلاصه
+        self.assertIn('7 attempts, 14 answers, 2 questions, 7 files', out.getvalue())
+        self.assertIn('Purged 1 subjects', out.getvalue())
+        for model in (Answer, StudentExam, Question, Choice):
+            self.assertFalse(model.objects.exists(), model)
+        self.assertFalse(Exam.all_objects.exists())
+        self.assertFalse(Subject.all_objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media, 'answers', 'files')), [])
+
+
+class CloneExamTests(TestCase):
+    def setUp(self):
+        teacher = User.objects.create_user(username='t1', user_type='teacher')
+        self.exam = Exam.objects.create(teacher=teacher, subject=Subject.objects.create(name='Math'), title='Final',
+                                        start_date=timezone.now(), duration_minutes=60, total_score=200)
+        questions = Question.objects.bulk_create([
+            Question(exam=self.exam, question_type=('mcq', 'short')[n % 2], text=f"q{n}", model_answer=f"a{n}")
+            for n in range(200)
+        ])
+        Choice.objects.bulk_create([
+            Choice(question=q, text=f"{q.text}-{c}", is_correct=c == 1)
+            for q in questions if q.question_type == 'mcq' for c in range(4)
+        ])
+
+    def snapshot(self, exam):
+        return [(q.question_type, q.text, q.marks, q.model_answer,
+                 [(c.text, c.is_correct) for c in q.choices.order_by('pk')])
+                for q in exam.questions.order_by('pk')]
+
+    def test_clone_to_sections_in_bulk(self):
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('clone_exam', self.exam.pk, '--section', 'A', '--section', 'B', '--section', 'C',
+                         '--start', '2030-02-01T09:00', stdout=out)
+        statements = Counter(q['sql'].split()[0] for q in ctx.captured_queries)
+        # فقط دسته‌های INSERT (بسته به سقف پارامترهای SQLite)، نه یک کوئری برای هر سوال
+        self.assertEqual(statements['SELECT'], 3)
+        self.assertLess(statements['INSERT'], 20)
+        self.assertNotIn('UPDATE', statements)
+        copies = list(Exam.objects.exclude(pk=self.exam.pk).order_by('pk'))
+        self.assertEqual([e.title for e in copies], ['Final - A', 'Final - B', 'Final - C'])
+        original = self.snapshot(self.exam)
+        for copy in copies:
+            self.assertEqual(copy.start_date.year, 2030)
+            self.assertEqual(self.snapshot(copy), original)
+        self.assertEqual(Choice.objects.count(), 4 * 400)
+
+    def test_teacher_copies_own_exam_from_the_dashboard(self):
+        User.objects.create_user(username='t2', password='p2', user_type='teacher')
+        self.client.login(username='t2', password='p2')
+        url = reverse('Quiz:copy_exam', args=[self.exam.pk])
+        self.assertEqual(self.client.post(url).status_code, 404)
+
+        self.exam.teacher.set_password('p1')
+        self.exam.teacher.save()
+        self.client.login(username='t1', password='p1')
+        self.assertContains(self.client.get(reverse('Quiz:teacher_dashboard')), url)
+        response = self.client.post(url)
+        copy = Exam.objects.get(title='Final (کپی)')
+        self.assertRedirects(response, reverse('Quiz:edit_exam', args=[copy.pk]))
+        self.assertEqual(copy.teacher, self.exam.teacher)
+        self.assertEqual(self.snapshot(copy), self.snapshot(self.exam))
+
+    def test_unsupported_database_is_reported(self):
+        with mock.patch.object(connection.features, 'can_return_rows_from_bulk_insert', False):
+            with self.assertRaisesMessage(CommandError, 'primary keys'):
+                call_command('clone_exam', self.exam.pk, stdout=io.StringIO())
+            self.exam.teacher.set_password('p1')
+            self.exam.teacher.save()
+            self.client.login(username='t1', password='p1')
+            response = self.client.post(reverse('Quiz:copy_exam', args=[self.exam.pk]))
+        self.assertRedirects(response, reverse('Quiz:teacher_dashboard'), fetch_redirect_response=False)
+        self.assertEqual(Exam.objects.count(), 1)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        other = User.objects.create_user(username='t2', user_type='teacher')
+        subject = Subject.objects.create(name='ریاضی', description='جبر و هندسه')
+        self.exam = Exam.objects.create(teacher=self.teacher, subject=subject, title='میان‌ترم فیزیک',
+                                        start_date=timezone.now(), duration_minutes=60, total_score=10)
+        self.question = Question.objects.create(exam=self.exam, question_type='short',
+                                                text='سرعت نور در خلأ چقدر است؟', model_answer='۳۰۰۰۰۰ کیلومتر')
+        Question.objects.create(exam=self.exam, question_type='short', text='نور نور نور: بازتاب نور را توضیح دهید')
+        foreign = Exam.objects.create(teacher=other, subject=subject, title='نور', start_date=timezone.now(),
+                                      duration_minutes=60, total_score=10)
+        Question.objects.create(exam=foreign, question_type='short', text='نور سفید')
+
+    def found(self, query, **kwargs):
+        return [(e.kind, e.object_id) for e in search.search(query, teacher=self.teacher, **kwargs)]
+
+    def test_persian_normalization_and_prefix(self):
+        # ي و ك عربی، ارقام فارسی و بدون نیم‌فاصله
+        self.assertEqual(self.found('سرعت نو'), [('question', self.question.pk)])
+        self.assertEqual(self.found('300000'), [('question', self.question.pk)])
+        self.assertEqual(self.found('ميانترم'), [('exam', self.exam.pk)])
+        self.assertEqual(self.found('هندسه'), [('subject', self.exam.subject_id)])
+        self.assertEqual(self.found('!!!'), [])
+
+    def test_ranking_ownership_and_incremental_updates(self):
+        results = self.found('نور')
+        self.assertEqual(len(results), 2)  # سوال معلم دیگر دیده نمی‌شود
+        self.assertNotEqual(results[0], ('question', self.question.pk))  # متن با تکرار بیشتر بالاتر است
+
+        self.question.text = 'شتاب جاذبه'
+        self.question.model_answer = ''
+        self.question.save()
+        self.assertEqual(self.found('شتاب'), [('question', self.question.pk)])
+        self.assertEqual(len(self.found('نور')), 1)
+        self.exam.soft_delete()
+        self.assertEqual(self.found('شتاب'), [])
+        self.question.delete()
+        self.assertFalse(search.SearchEntry.objects.filter(kind='question', object_id=self.question.pk).exists())
+
+    def test_soft_deleted_subject_leaves_the_index(self):
+        self.exam.subject.soft_delete()
+        self.assertEqual(self.found('هندسه'), [])
+        self.assertEqual(self.found('سرعت'), [])
+        self.assertFalse(search.SearchEntry.objects.filter(kind='subject', object_id=self.exam.subject_id).exists())
+
+    def test_view(self):
+        self.client.login(username='t1', password='p1')
+        response = self.client.get(reverse('Quiz:search'), {'q': 'سرعت', 'kind': 'question'})
+        self.assertContains(response, reverse('Quiz:edit_question', args=[self.question.pk]))
+
+
+@override_settings(RATELIMITS={'login': {'ip': '4/m', 'post:username': '2/m'}})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        ratelimit.get_backend().reset()
+        ratelimit.stats.clear()
+
+    def test_login_is_throttled_per_username_then_per_ip(self):
+        url = reverse('Quiz:login')
+        statuses = [self.client.post(url, {'username': name, 'password': 'x'}).status_code
+                    for name in ('s1', 'S1 ', 's1', 's2', 's3')]
+        self.assertEqual(statuses, [200, 200, 429, 200, 429])
+        response = self.client.post(url, {'username': 's4', 'password': 'x'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(1, 61))
+        self.assertEqual(self.client.get(url).status_code, 200)
+        body = metrics.render_prometheus()
+        self.assertIn('quiz_ratelimit_total{scope="login",result="allowed"} 3', body)
+        self.assertIn('quiz_ratelimit_total{scope="login",result="blocked"} 3', body)
+
+    @override_settings(RATELIMIT_TRUSTED_PROXIES=['10.0.0.1'])
+    def test_client_ip_comes_from_a_trusted_proxy_only(self):
+        factory = RequestFactory()
+        proxied = factory.post('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.1.1.1, 2.2.2.2')
+        self.assertEqual(ratelimit.client_ip(proxied), '2.2.2.2')
+        direct = factory.post('/', REMOTE_ADDR='3.3.3.3', HTTP_X_FORWARDED_FOR='2.2.2.2')
+        self.assertEqual(ratelimit.client_ip(direct), '3.3.3.3')
+
+    def test_locmem_window_slides(self):
+        backend = ratelimit.LocMemBackend()
+        self.assertEqual([backend.attempt('k', 2, 0.05) for _ in range(2)], [0, 0])
+        self.assertGreater(backend.attempt('k', 2, 0.05), 0)
+        time.sleep(0.06)
+        self.assertEqual(backend.attempt('k', 2, 0.05), 0)
+        self.assertEqual(ratelimit.parse_rate('5/15m'), (5, 900))
+
+
+class RosterTests(TestCase):
+    def setUp(self):
+        self.teacher = User.objects.create_user(username='t1', password='p1', user_type='teacher')
+        self.students = [User.objects.create_user(username=f"s{i}", password='p1', user_type='student')
+                         for i in range(3)]
+        self.subject = Subject.objects.create(name='Math')
+
+    def test_assigned_roster_gets_attempts_ahead_of_time(self):
+        self.client.login(username='t1', password='p1')
+        response = self.client.post(reverse('Quiz:roster_list'), {'name': '10A', 'usernames': 's0\ns1\nnobody'})
+        self.assertContains(response, 'nobody')
+        self.client.post(reverse('Quiz:roster_list'), {'name': '10A', 'usernames': 's0\ns1\n'})
+        roster = Roster.objects.get(name='10A')
+
+        self.client.post(reverse('Quiz:create_exam'), {
+            'subject': self.subject.pk, 'title': 'Final', 'start_date': timezone.localtime().strftime('%Y-%m-%dT%H:%M'),
+            'duration_minutes': 60, 'total_score': 20, 'rosters': [roster.pk],
+        })
+        exam = Exam.objects.get(title='Final')
+        self.assertEqual(set(StudentExam.objects.filter(exam=exam).values_list('student__username', flat=True)),
+                         {'s0', 's1'})
+
+        self.client.post(reverse('Quiz:edit_roster', args=[roster.pk]), {'name': '10A', 'usernames': 's0\ns1\ns2'})
+        self.assertEqual(StudentExam.objects.filter(exam=exam).count(), 3)
+        self.assertEqual(StudentExam.objects.filter(exam=exam, started_at__isnull=False).count(), 0)
+
+    def test_enroll_is_a_lookup_and_take_exam_starts_once(self):
+        roster = Roster.objects.create(teacher=self.teacher, name='10A')
+        roster.students.add(self.students[0])
+        exam = Exam.objects.create(teacher=self.teacher, subject=self.subject, title='Live',
+                                   start_date=timezone.now(), duration_minutes=60, total_score=20)
+        assign_rosters(exam, [roster])
+        attempt = StudentExam.objects.get(exam=exam)
+
+        self.client.login(username='s0', password='p1')
+        self.assertContains(self.client.get(reverse('Quiz:student_dashboard')), 'Live')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('Quiz:enroll_exam', args=[exam.pk]))
+        self.assertRedirects(response, reverse('Quiz:take_exam', args=[attempt.pk]), fetch_redirect_response=False)
+        self.assertFalse([q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "Quiz_studentexam"')])
+
+        self.client.get(reverse('Quiz:take_exam', args=[attempt.pk]))
+        attempt.refresh_from_db()
+        started_at = attempt.started_at
+        self.assertIsNotNone(started_at)
+        self.assertFalse(attempt.start())
+        self.client.get(reverse('Quiz:take_exam', args=[attempt.pk]))
+        attempt.refresh_from_db()
+        self.assertEqual(attempt.started_at, started_at)
+
+        self.client.login(username='s1', password='p1')
+        self.assertRedirects(self.client.get(reverse('Quiz:enroll_exam', args=[exam.pk])),
+                             reverse('Quiz:student_dashboard'))
+        self.assertEqual(StudentExam.objects.filter(exam=exam).count(), 1)
@@ -1,12 +1,13 @@
 from django.urls import path
 from . import views
+from .ratelimit import ratelimit
 from django.contrib.auth import views as auth_views
 
 app_name = 'Quiz'
 
 urlpatterns = [
     path('', views.home, name='home'),
-    path('login/', auth_views.LoginView.as_view(), name='login'),
+    path('login/', ratelimit('login')(auth_views.LoginView.as_view()), name='login'),
     path('logout/', views.user_logout, name='logout'), # Changed to use custom view if needed or built-in
     
     # Registration & Activation
@@ -23,10 +24,14 @@ urlpatterns = [
     
     path('subjects/', views.subject_list, name='subject_list'),
     path('subjects/create/', views.create_subject, name='create_subject'),
+    path('search/', views.search_content, name='search'),
+    path('rosters/', views.roster_list, name='roster_list'),
+    path('rosters/<int:roster_id>/', views.edit_roster, name='edit_roster'),
     
     path('exam/create/', views.create_exam, name='create_exam'),
     path('exam/<int:exam_id>/edit/', views.edit_exam, name='edit_exam'),
     path('exam/<int:exam_id>/delete/', views.delete_exam, name='delete_exam'),
+    path('exam/<int:exam_id>/copy/', views.copy_exam, name='copy_exam'),
     path('exam/<int:exam_id>/questions/add/', views.add_questions, name='add_questions'),
     
     path('question/<int:question_id>/edit/', views.edit_question, name='edit_question'),
@@ -34,8 +39,16 @@ urlpatterns = [
     
     path('exam/<int:exam_id>/enroll/', views.enroll_exam, name='enroll_exam'),
     path('exam/<int:student_exam_id>/take/', views.take_exam, name='take_exam'),
+    path('exam/<int:student_exam_id>/autosave/', views.autosave_answer, name='autosave_answer'),
     path('exam/<int:student_exam_id>/result/', views.exam_result, name='exam_result'),
     
     path('exam/<int:exam_id>/grade/', views.grade_exam, name='grade_exam'),
     path('student-exam/<int:student_exam_id>/grade/', views.grade_student_answers, name='grade_student_answers'),
+    path('student-exam/<int:student_exam_id>/files/<int:question_id>/', views.answer_file, name='answer_file'),
+    path('exam/<int:exam_id>/submissions.zip', views.download_submissions, name='download_submissions'),
+    path('exam/<int:exam_id>/proctor/', views.proctor_exam, name='proctor_exam'),
+    path('exam/<int:exam_id>/proctor/snapshot/', views.proctor_snapshot, name='proctor_snapshot'),
+
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('metrics', views.metrics, name='metrics'),
 ]
@@ -1,25 +1,41 @@
 import logging
+import os
+import uuid
 
 from django.contrib import messages
 from django.contrib.auth import login, logout
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.sites.shortcuts import get_current_site
-from django.core.mail import EmailMessage
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Count, Q
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
-from django.template.loader import render_to_string
 from django.utils import timezone
-from django.utils.encoding import force_bytes, force_str
-from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-
+from django.utils.crypto import constant_time_compare
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
+from django.views.decorators.http import require_POST
+
+from . import metrics as request_metrics, proctoring, search
+from .cache import cached_subjects, fragment_stats
+from .cloning import CloneError, clone_exam
+from .db_routers import read_replica
+from .downloads import serve_file
+from .exports import stream_submissions_zip
+from .emails import activation_email
 from .forms import (
     TeacherRegistrationForm,
     StudentRegistrationForm,
     ExamForm,
     QuestionForm,
+    RosterForm,
     ChoiceFormSet,
 )
-from .models import Subject, Exam, Question, StudentExam, Answer, User, OTP
+from .models import Subject, Exam, Question, Roster, StudentExam, User, OTP, assign_rosters, create_attempts
+from .ratelimit import client_ip, ratelimit
+from .sms import send_sms
 from .tokens import account_activation_token
 
 logger = logging.getLogger('quiz')
@@ -27,19 +43,11 @@ logger = logging.getLogger('quiz')
 
 def send_activation_email(request, user, to_email):
     current_site = get_current_site(request)
-    mail_subject = 'فعال‌سازی حساب کاربری'
-    message = render_to_string('acc_active_email.html', {
-        'user': user,
-        'domain': current_site.domain,
-        'uid': urlsafe_base64_encode(force_bytes(user.pk)),
-        'token': account_activation_token.make_token(user),
-    })
-    email = EmailMessage(mail_subject, message, to=[to_email])
-    email.send()
+    activation_email(user, current_site.domain, to_email).send()
 
 
 def home(request):
-    logger.info(f"Home page visit by {request.user}")
+    logger.info("Home page visit by %s", request.user)
     if not request.user.is_authenticated:
         return redirect('Quiz:login')
 
@@ -49,6 +57,7 @@ def home(request):
         return redirect('Quiz:student_dashboard')
 
 
+@ratelimit('register')
 def teacher_register(request):
     if request.method == 'POST':
         form = TeacherRegistrationForm(request.POST)
@@ -66,6 +75,7 @@ def teacher_register(request):
     return render(request, 'register.html', {'form': form, 'role': 'معلم'})
 
 
+@ratelimit('register')
 def student_register(request):
     if request.method == 'POST':
         form = StudentRegistrationForm(request.POST)
@@ -100,10 +110,11 @@ def activate(request, uidb64, token):
         return HttpResponse('لینک فعال‌سازی نامعتبر است!')
 
 
+@ratelimit('verify_sms')
 def verify_sms(request):
     """
-    این ویو یک شبیه‌سازی برای سیستم OTP است.
-    چون پنل پیامکی متصل نیست، کد را در کنسول چاپ می‌کنیم.
+    ارسال و تایید کد OTP.
+    پیامک از طریق بک‌اند تنظیم‌شده در SMS_BACKEND ارسال می‌شود.
     """
     if request.method == 'POST':
         phone = request.POST.get('phone')
@@ -113,13 +124,10 @@ def verify_sms(request):
             otp, created = OTP.objects.get_or_create(phone=phone)
             otp.generate_code()
 
-            # Mock sending SMS (چاپ در کنسول به جای ارسال واقعی)
-            print(f"\n************ SMS ************")
-            print(f"To: {phone}")
-            print(f"Code: {otp.code}")
-            print(f"*****************************\n")
+            # کد در SmsMessage.body (و پنل مدیریت) پوشانده می‌شود
+            send_sms(phone, f"کد تایید شما: {otp.code}", secrets=[otp.code])
 
-            messages.info(request, f"کد تایید به {phone} ارسال شد (کنسول را چک کنید).")
+            messages.info(request, f"کد تایید به {phone} ارسال شد.")
             return render(request, 'verify_sms.html', {'phone': phone, 'step': 2})
 
 
@@ -140,39 +148,56 @@ def verify_sms(request):
 
 
 @login_required
+@read_replica
 def teacher_dashboard(request):
     if request.user.user_type != 'teacher':
         return redirect('Quiz:student_dashboard')
-    exams = Exam.objects.filter(teacher=request.user).prefetch_related(
-        'questions', 'studentexam_set__student'
+    exams = Exam.objects.filter(teacher=request.user).select_related('subject').annotate(
+        question_count=Count('questions', distinct=True),
+        submitted_count=Count('studentexam', filter=Q(studentexam__is_finished=True), distinct=True),
     )
-    for exam in exams:
-        submitted = exam.studentexam_set.filter(is_finished=True)
-        exam.has_submitted = submitted.exists()
-        exam.submitted_count = submitted.count()
     return render(request, 'teacher/dashboard.html', {'exams': exams})
 
 
 @login_required
+@read_replica
 def student_dashboard(request):
     if request.user.user_type != 'student':
         return redirect('Quiz:teacher_dashboard')
-    enrolled = StudentExam.objects.filter(student=request.user)
-    available_exams = Exam.objects.exclude(studentexam__student=request.user)
+    # تلاش‌های کلاس‌های تخصیص‌یافته از پیش ساخته شده‌اند؛ آزمون‌های بدون کلاس برای همه باز است
+    enrolled = StudentExam.objects.visible().filter(student=request.user).select_related('exam')
+    available_exams = Exam.objects.open().filter(rosters=None).exclude(
+        studentexam__student=request.user).select_related('subject')
+    subject = request.GET.get('subject', '')
+    if subject.isdigit():
+        available_exams = available_exams.filter(subject_id=subject)
 
     return render(request, 'student/dashboard.html', {
         'enrolled_exams': enrolled,
         'available_exams': available_exams,
-        'subjects': Subject.objects.all()
+        # فهرست درس‌ها برای فیلتر از کش مشترک خوانده می‌شود
+        'subjects': cached_subjects,
+        'selected_subject': subject,
     })
 
 
 @login_required
 def subject_list(request):
-    subjects = Subject.objects.all()
+    subjects = Subject.objects.annotate(exam_count=Count('exam', filter=Q(exam__deleted_at__isnull=True)))
     return render(request, 'teacher/subject_list.html', {'subjects': subjects})
 
 
+@login_required
+def search_content(request):
+    if request.user.user_type != 'teacher':
+        return redirect('Quiz:student_dashboard')
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind')
+    kinds = [kind] if kind in dict(search.SearchEntry.KIND_CHOICES) else None
+    results = search.search(query, teacher=request.user, kinds=kinds) if query else []
+    return render(request, 'teacher/search.html', {'query': query, 'kind': kind, 'results': results})
+
+
 @login_required
 def create_subject(request):
     if request.method == 'POST':
@@ -184,17 +209,54 @@ def create_subject(request):
     return render(request, 'teacher/create_subject.html')
 
 
+@login_required
+def roster_list(request):
+    if request.user.user_type != 'teacher':
+        return redirect('Quiz:student_dashboard')
+    if request.method == 'POST':
+        form = RosterForm(request.POST)
+        if form.is_valid():
+            roster = form.save(commit=False)
+            roster.teacher = request.user
+            roster.save()
+            roster.add_students(form.cleaned_data['usernames'])
+            return redirect('Quiz:roster_list')
+    else:
+        form = RosterForm()
+    rosters = Roster.objects.filter(teacher=request.user).annotate(
+        student_count=Count('students', distinct=True), exam_count=Count('exams', distinct=True))
+    return render(request, 'teacher/rosters.html', {'rosters': rosters, 'form': form})
+
+
+@login_required
+def edit_roster(request, roster_id):
+    roster = get_object_or_404(Roster, id=roster_id, teacher=request.user)
+    if request.method == 'POST':
+        form = RosterForm(request.POST, instance=roster)
+        if form.is_valid():
+            form.save()
+            students = form.cleaned_data['usernames']
+            # حذف از کلاس تلاش‌های ساخته‌شده را پاک نمی‌کند
+            roster.students.remove(*roster.students.exclude(pk__in=[s.pk for s in students]))
+            roster.add_students(students)
+            return redirect('Quiz:roster_list')
+    else:
+        form = RosterForm(instance=roster)
+    return render(request, 'teacher/edit_roster.html', {'form': form, 'roster': roster})
+
+
 @login_required
 def create_exam(request):
     if request.method == 'POST':
-        form = ExamForm(request.POST)
+        form = ExamForm(request.POST, teacher=request.user)
         if form.is_valid():
             exam = form.save(commit=False)
             exam.teacher = request.user
             exam.save()
+            assign_rosters(exam, form.cleaned_data['rosters'])
             return redirect('Quiz:add_questions', exam.id)
     else:
-        form = ExamForm()
+        form = ExamForm(teacher=request.user)
     return render(request, 'teacher/create_exam.html', {'form': form})
 
 
@@ -202,12 +264,20 @@ def create_exam(request):
 def edit_exam(request, exam_id):
     exam = get_object_or_404(Exam, id=exam_id, teacher=request.user)
     if request.method == 'POST':
-        form = ExamForm(request.POST, instance=exam)
+        form = ExamForm(request.POST, instance=exam, teacher=request.user)
         if form.is_valid():
-            form.save()
+            exam = form.save(commit=False)
+            if 'start_date' in form.changed_data:
+                exam.reminder_sent_at = None
+            exam.save()
+            # برداشتن کلاس فقط پیوند را حذف می‌کند؛ تلاش‌های ساخته‌شده می‌مانند
+            rosters = set(form.cleaned_data['rosters'])
+            current = set(exam.rosters.all())
+            exam.rosters.remove(*(current - rosters))
+            assign_rosters(exam, rosters - current)
             return redirect('Quiz:teacher_dashboard')
     else:
-        form = ExamForm(instance=exam)
+        form = ExamForm(instance=exam, teacher=request.user)
     return render(request, 'teacher/edit_exam.html', {'form': form, 'exam': exam})
 
 
@@ -215,11 +285,27 @@ def edit_exam(request, exam_id):
 def delete_exam(request, exam_id):
     exam = get_object_or_404(Exam, id=exam_id, teacher=request.user)
     if request.method == 'POST':
-        exam.delete()
+        # ردیف‌های وابسته را Quiz.purge در پس‌زمینه و تکه‌تکه پاک می‌کند
+        exam.soft_delete()
         return redirect('Quiz:teacher_dashboard')
     return render(request, 'teacher/delete_exam.html', {'exam': exam})
 
 
+@login_required
+def copy_exam(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id, teacher=request.user)
+    if request.method == 'POST':
+        try:
+            copy, = clone_exam(exam, [{'title': f"{exam.title} (کپی)"}])
+        except CloneError as e:
+            logger.warning("Copying exam %s failed: %s", exam.pk, e)
+            messages.error(request, "کپی آزمون روی این پایگاه داده پشتیبانی نمی‌شود.")
+            return redirect('Quiz:teacher_dashboard')
+        # زمان شروع کپی معمولاً باید عوض شود
+        return redirect('Quiz:edit_exam', copy.id)
+    return render(request, 'teacher/copy_exam.html', {'exam': exam})
+
+
 @login_required
 def add_questions(request, exam_id):
     exam = get_object_or_404(Exam, id=exam_id, teacher=request.user)
@@ -237,7 +323,7 @@ def add_questions(request, exam_id):
     else:
         question_form = QuestionForm()
         formset = ChoiceFormSet()
-    questions = exam.questions.all()
+    questions = exam.questions.prefetch_related('choices')
     return render(request, 'teacher/add_questions.html', {
         'exam': exam, 'question_form': question_form, 'formset': formset, 'questions': questions
     })
@@ -245,7 +331,7 @@ def add_questions(request, exam_id):
 
 @login_required
 def edit_question(request, question_id):
-    question = get_object_or_404(Question, id=question_id, exam__teacher=request.user)
+    question = get_object_or_404(Question, id=question_id, exam__teacher=request.user, exam__deleted_at__isnull=True)
     if request.method == 'POST':
         form = QuestionForm(request.POST, instance=question)
         if form.is_valid():
@@ -263,7 +349,7 @@ def edit_question(request, question_id):
 
 @login_required
 def delete_question(request, question_id):
-    question = get_object_or_404(Question, id=question_id, exam__teacher=request.user)
+    question = get_object_or_404(Question, id=question_id, exam__teacher=request.user, exam__deleted_at__isnull=True)
     exam_id = question.exam.id
     if request.method == 'POST':
         question.delete()
@@ -273,60 +359,189 @@ def delete_question(request, question_id):
 
 @login_required
 def enroll_exam(request, exam_id):
-    exam = get_object_or_404(Exam, id=exam_id)
-    student_exam, created = StudentExam.objects.get_or_create(student=request.user, exam=exam)
-    if created:
-        student_exam.started_at = timezone.now()
-        student_exam.save()
+    exam = get_object_or_404(Exam.objects.with_schedule(), id=exam_id)
+    if exam.status == 'closed':
+        messages.error(request, "مهلت شرکت در این آزمون به پایان رسیده است.")
+        return redirect('Quiz:student_dashboard')
+    # تلاش دانش‌آموزان کلاس‌های تخصیص‌یافته از پیش ساخته شده است؛ اینجا فقط خوانده می‌شود
+    student_exam = StudentExam.objects.filter(student=request.user, exam=exam).only('pk').first()
+    if student_exam is None:
+        if exam.rosters.exists():
+            messages.error(request, "این آزمون به کلاس شما تخصیص داده نشده است.")
+            return redirect('Quiz:student_dashboard')
+        create_attempts(exam, [request.user.pk])
+        student_exam = StudentExam.objects.only('pk').get(student=request.user, exam=exam)
+    if exam.status == 'upcoming':
+        messages.info(request, "ثبت‌نام انجام شد؛ آزمون در زمان شروع در دسترس خواهد بود.")
+        return redirect('Quiz:student_dashboard')
     return redirect('Quiz:take_exam', student_exam.id)
 
 
+def attempt_deadline(student_exam, exam):
+    # زمان هر دانش‌آموز از لحظه‌ی ورودش حساب می‌شود ولی از پایان آزمون نمی‌گذرد
+    return min(student_exam.started_at + timezone.timedelta(minutes=exam.duration_minutes), exam.ends_at)
+
+
 @login_required
 def take_exam(request, student_exam_id):
-    student_exam = get_object_or_404(StudentExam, id=student_exam_id, student=request.user, is_finished=False)
-    exam = student_exam.exam
-    if not student_exam.started_at:
-        student_exam.started_at = timezone.now()
-        student_exam.save()
+    student_exam = get_object_or_404(StudentExam.objects.visible(), id=student_exam_id, student=request.user)
+    key = request.POST.get('submission_key') or None
+    if student_exam.is_finished:
+        # ارسال تکراری (دوبار کلیک، ارسال خودکار تایمر یا زبانه‌ی دیگر) فقط نتیجه‌ی ذخیره‌شده را می‌بیند
+        if request.method == "POST" and key != student_exam.submission_key:
+            messages.info(request, "این آزمون پیش‌تر ارسال شده است.")
+        return redirect('Quiz:exam_result', student_exam.id)
+    exam = student_exam.exam = Exam.objects.with_schedule().get(pk=student_exam.exam_id)
+    if exam.status == 'upcoming':
+        messages.error(request, "این آزمون هنوز شروع نشده است.")
+        return redirect('Quiz:student_dashboard')
+    now = timezone.now()
+    if not student_exam.started_at and student_exam.start(now):
+        proctoring.record(student_exam, 'started', request.user.username)
 
-    elapsed = timezone.now() - student_exam.started_at
-    remaining_time = timezone.timedelta(minutes=exam.duration_minutes) - elapsed
+    remaining_time = attempt_deadline(student_exam, exam) - now
 
     if request.method == "POST" or remaining_time.total_seconds() <= 0:
-        for question in exam.questions.all():
-            answer, _ = Answer.objects.get_or_create(student_exam=student_exam, question=question)
+        # پس از مهلت، مانند ذخیره‌ی خودکار، پاسخ‌های ارسالی پذیرفته نمی‌شوند و فقط تلاش بسته می‌شود
+        on_time = remaining_time.total_seconds() > 0
+        data, files = (request.POST, request.FILES) if on_time else (None, None)
+        if student_exam.submit(data, files, key=key):
+            proctoring.record(student_exam, 'submitted', request.user.username)
+        elif key != student_exam.submission_key:
+            messages.info(request, "این آزمون پیش‌تر ارسال شده است.")
+        return redirect('Quiz:exam_result', student_exam.id)
 
-            if question.question_type == 'mcq': answer.auto_grade()
+    proctoring.record(student_exam, 'active', request.user.username)
+    answers = {a.question_id: a for a in student_exam.get_answers()}
+    questions = list(exam.questions.prefetch_related('choices'))
+    for question in questions:
+        question.student_answer = answers.get(question.id)
+    return render(request, 'student/take_exam.html', {
+        'student_exam': student_exam, 'exam': exam, 'questions': questions, 'submission_key': uuid.uuid4().hex,
+        'remaining_seconds': int(remaining_time.total_seconds()),
+    })
 
-        student_exam.calculate_final_score()
-        student_exam.mark_as_finished()
-        return redirect('Quiz:exam_result', student_exam.id)
 
-    return render(request, 'student/take_exam.html', {'student_exam': student_exam, 'exam': exam})
+@login_required
+@require_POST
+def autosave_answer(request, student_exam_id):
+    student_exam = get_object_or_404(StudentExam.objects.visible(), id=student_exam_id, student=request.user, is_finished=False)
+    exam = student_exam.exam = Exam.objects.with_schedule().get(pk=student_exam.exam_id)
+    if exam.status != 'live' or not student_exam.started_at or attempt_deadline(student_exam, exam) <= timezone.now():
+        return JsonResponse({'saved': 0, 'error': "زمان آزمون به پایان رسیده است."}, status=409)
+    with transaction.atomic():
+        if not student_exam.claim():
+            return JsonResponse({'saved': 0, 'error': "این آزمون پیش‌تر ارسال شده است."}, status=409)
+        saved = student_exam.save_answers(request.POST)
+    proctoring.record(student_exam, 'active', request.user.username)
+    return JsonResponse({'saved': saved})
 
 
 @login_required
+@read_replica
 def exam_result(request, student_exam_id):
-    student_exam = get_object_or_404(StudentExam, id=student_exam_id, student=request.user)
-    return render(request, 'student/result.html', {'student_exam': student_exam})
+    student_exam = get_object_or_404(StudentExam.objects.visible().select_related('exam'), id=student_exam_id, student=request.user)
+    return render(request, 'student/result.html', {'student_exam': student_exam, 'answers': student_exam.get_answers()})
 
 
 @login_required
+@read_replica
 def grade_exam(request, exam_id):
     exam = get_object_or_404(Exam, id=exam_id, teacher=request.user)
-    student_exams = StudentExam.objects.filter(exam=exam, is_finished=True)
-    return render(request, 'teacher/grade_exam.html', {'exam': exam, 'student_exams': student_exams})
+    student_exams = StudentExam.objects.filter(exam=exam, is_finished=True).select_related(
+        'student'
+    ).with_grading_status()
+    file_questions = exam.questions.filter(question_type='file')
+    return render(request, 'teacher/grade_exam.html', {
+        'exam': exam, 'student_exams': student_exams, 'file_questions': file_questions
+    })
 
 
 @login_required
 def grade_student_answers(request, student_exam_id):
-    student_exam = get_object_or_404(StudentExam, id=student_exam_id, exam__teacher=request.user)
+    # تلاش در حال برگزاری هنوز با autosave نوشته می‌شود؛ تصحیح فقط پس از پایان
+    student_exam = get_object_or_404(StudentExam.objects.visible().select_related('exam', 'student'),
+                                     id=student_exam_id, exam__teacher=request.user, is_finished=True)
     if request.method == 'POST':
-        student_exam.calculate_final_score()
+        if student_exam.archived_at:
+            messages.error(request, "این پاسخ‌نامه بایگانی شده است؛ برای تصحیح دوباره ابتدا آن را بازیابی کنید.")
+        else:
+            student_exam.grade_answers(request.POST)
         return redirect('Quiz:grade_exam', student_exam.exam.id)
-    return render(request, 'teacher/grade_student_answers.html', {'student_exam': student_exam})
+    answers_to_grade = [a for a in student_exam.get_answers() if a.question.question_type != 'mcq']
+    return render(request, 'teacher/grade_student_answers.html', {
+        'student_exam': student_exam, 'answers_to_grade': answers_to_grade
+    })
+
+
+@login_required
+def download_submissions(request, exam_id):
+    exam = get_object_or_404(Exam, id=exam_id, teacher=request.user)
+    question_id = request.GET.get('question')
+    question_id = int(question_id) if question_id and question_id.isdigit() else None
+    suffix = f"-q{question_id}" if question_id else ''
+    response = StreamingHttpResponse(stream_submissions_zip(exam, question_id), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="exam-{exam.id}{suffix}-submissions.zip"'
+    # پروکسی نباید کل آرشیو را پیش از ارسال روی دیسک بافر کند
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def proctor_exam(request, exam_id):
+    exam = get_object_or_404(Exam.objects.with_schedule(), id=exam_id, teacher=request.user)
+    return render(request, 'teacher/proctor.html', {
+        'exam': exam, 'snapshot': proctoring.tick(exam.id),
+        'poll_seconds': getattr(settings, 'PROCTOR_TICK_SECONDS', 2),
+    })
+
+
+@login_required
+def proctor_snapshot(request, exam_id):
+    # هر پایشگر هر PROCTOR_TICK_SECONDS یک درخواست کوتاه می‌فرستد و هیچ worker را نگه نمی‌دارد؛
+    # اگر تیک تازه‌ای نیامده باشد 204 بدون بدنه برمی‌گردد
+    exam = get_object_or_404(Exam.objects.only('pk'), id=exam_id, teacher=request.user)
+    snapshot = proctoring.tick(exam.id)
+    if request.GET.get('since') == str(snapshot['at']):
+        return HttpResponse(status=204)
+    response = JsonResponse(snapshot, json_dumps_params={'ensure_ascii': False})
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@login_required
+def answer_file(request, student_exam_id, question_id):
+    # فقط خود دانش‌آموز و معلم همان آزمون؛ برای بقیه 404 تا وجود فایل هم لو نرود
+    student_exam = get_object_or_404(
+        StudentExam.objects.visible().select_related('exam').filter(Q(student=request.user) | Q(exam__teacher=request.user)),
+        id=student_exam_id,
+    )
+    answer = next((a for a in student_exam.get_answers() if a.question_id == question_id and a.uploaded_file), None)
+    if answer is None:
+        raise Http404
+    extension = os.path.splitext(answer.uploaded_file.name)[1]
+    filename = f"{student_exam.student_id}-q{question_id}{extension}"
+    return serve_file(request, answer.uploaded_file, filename)
 
 
 def user_logout(request):
     logout(request)
     return redirect('Quiz:login')
+
+
+@staff_member_required
+def cache_stats(request):
+    # آمار hit/miss کش قطعه‌ها در همین پردازه
+    return JsonResponse(fragment_stats())
+
+
+def metrics(request):
+    # پشت پراکسی REMOTE_ADDR همیشه آدرس پراکسی است؛ نشانی واقعی از client_ip خوانده می‌شود
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    allowed = (
+        bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+        or client_ip(request) in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    )
+    if not allowed and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(request_metrics.render_prometheus(), content_type='text/plain; version=0.0.4')